@@ -1,189 +1,275 @@
-import asyncio
+import functools
+import hashlib
 import logging
-from typing import Optional
-import requests
-import json
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+import httpx
+import orjson
+
+
+# Response cache limits (entries / seconds)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600
+
+SUPPORTED_PROVIDERS = ("gemini", "openai", "openrouter")
+
+# Sentence terminators (Latin and Persian) used to trim oversize captions locally
+_SENTENCE_END = re.compile(r'[.!?؟\n]')
 
 
 class UniversalMessageProcessor:
     """Processes messages using various AI providers with smart summarization."""
     
-    def __init__(self, api_key: str, model_name: str = "gemini-pro", provider: str = "gemini", base_url: str = ""):
+    def __init__(self, api_key: str, model_name: str = "gemini-pro", provider: str = "gemini", base_url: str = "",
+                 min_length: int = 20):
         self.api_key = api_key
         self.model_name = model_name
         self.provider = provider.lower()
         self.base_url = base_url
+        self.min_length = min_length
         
-        # Default prompt for caption summarization (600-800 characters)
+        if self.provider not in SUPPORTED_PROVIDERS:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        
+        # Default prompt for caption summarization (600-800 characters).
+        # Templates keep all static instructions ahead of {original_text} so providers
+        # can reuse the cached prefix across calls.
         self.summarization_template = """
-        لطفاً متن زیر را به صورت خلاصه و حرفه‌ای در زبان فارسی بازنویسی کنید. متن باید بین 600 تا 800 کاراکتر باشد، واضح، دقیق و مناسب برای انتشار در کانال تلگرام باشد. نکات مهم و اصلی را حفظ کنید:
-
-        متن اصلی: {original_text}
+        لطفاً متن زیر را به صورت خلاصه و حرفه‌ای در زبان فارسی بازنویسی کنید. متن باید بین 600 تا 800 کاراکتر باشد، واضح، دقیق و مناسب برای انتشار در کانال تلگرام باشد. نکات مهم و اصلی را حفظ کنید. لطفاً فقط متن بازنویسی شده را ارائه دهید.
 
-        لطفاً فقط متن بازنویسی شده را ارائه دهید.
-        """
+        متن اصلی: {original_text}"""
         
         # Original template for full processing
         self.prompt_template = """
-        لطفاً متن زیر را به صورت رسمی و حرفه‌ای در زبان فارسی بازنویسی کنید. متن باید واضح، دقیق و مناسب برای انتشار در کانال تلگرام باشد:
+        لطفاً متن زیر را به صورت رسمی و حرفه‌ای در زبان فارسی بازنویسی کنید. متن باید واضح، دقیق و مناسب برای انتشار در کانال تلگرام باشد. لطفاً فقط متن بازنویسی شده را ارائه دهید.
 
-        متن اصلی: {original_text}
+        متن اصلی: {original_text}"""
+        
+        # Stricter template used when a caption still overflows after the first pass
+        self.aggressive_template = """
+        لطفاً متن زیر را به صورت بسیار خلاصه و مختصر در زبان فارسی بازنویسی کنید. متن نهایی باید حداکثر 700 کاراکتر باشد و نکات کلیدی را حفظ کند. لطفاً فقط متن خلاصه شده را ارائه دهید.
 
-        لطفاً فقط متن بازنویسی شده را ارائه دهید.
-        """
+        متن اصلی: {original_text}"""
+        
+        # Templates are split once into (instructions, tail) so the hot path only concatenates
+        self._summarization_parts = self._split_template(self.summarization_template)
+        self._prompt_parts = self._split_template(self.prompt_template)
+        self._aggressive_parts = self._split_template(self.aggressive_template)
+        
+        # Provider coroutine resolved once
+        self._process_fn = {
+            "gemini": self._process_gemini,
+            "openai": self._process_openai,
+            "openrouter": self._process_openrouter,
+        }[self.provider]
+        
+        # LRU of provider responses keyed by prompt hash: key -> (timestamp, response)
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
         
         # Initialize based on provider
+        self._http: Optional[httpx.AsyncClient] = None
         if self.provider == "gemini":
             import google.generativeai as genai
             genai.configure(api_key=api_key)
             self.model = genai.GenerativeModel(model_name)
+        else:
+            # Endpoint and request headers are identical for every call, so build them once
+            self._headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+            if self.provider == "openai":
+                self._url = base_url or "https://api.openai.com/v1/chat/completions"
+            elif base_url.endswith('/chat/completions'):
+                self._url = base_url
+            elif base_url.endswith('/v1'):
+                self._url = f"{base_url}/chat/completions"
+            else:
+                self._url = f"{base_url}/v1/chat/completions"
+            
+            if self.provider == "openrouter":
+                self._headers["HTTP-Referer"] = "https://github.com/your-repo"  # Optional
+                self._headers["X-Title"] = "Telegram Channel Processor"  # Optional
+            
+            # Shared keep-alive pool so consecutive calls reuse the same TLS connection
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=httpx.Timeout(30.0)
+            )
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
     
     async def process_message(self, message_text: str, custom_prompt: Optional[str] = None, custom_footer: Optional[str] = None) -> Optional[str]:
         """Process a message using the configured AI provider with smart template selection."""
+        text_len = len(message_text) if message_text else 0
+        footer = custom_footer or ""
+        foot_len = len(footer)
+        
+        # Empty or very short texts are not worth an LLM round-trip
+        if not message_text or text_len < self.min_length or not message_text.strip():
+            return (message_text or "") + footer
+        
+        # Choose appropriate template based on text length and custom prompt
+        if custom_prompt:
+            instructions, tail = self._split_template(custom_prompt)
+            # A template that is only {original_text} is a passthrough relay: no LLM call
+            if not instructions.strip() and not tail.strip():
+                return message_text + footer
+        elif text_len > 800:
+            # Use summarization template for long texts
+            instructions, tail = self._summarization_parts
+        else:
+            # Use regular template for shorter texts
+            instructions, tail = self._prompt_parts
+        
         try:
-            # Choose appropriate template based on text length and custom prompt
-            if custom_prompt:
-                prompt = custom_prompt
-            else:
-                text_length = len(message_text) if message_text else 0
-                if text_length > 800:
-                    # Use summarization template for long texts
-                    prompt = self.summarization_template
-                else:
-                    # Use regular template for shorter texts
-                    prompt = self.prompt_template
-            
-            formatted_prompt = prompt.format(original_text=message_text)
-            
-            if self.provider == "gemini":
-                response = await self._process_gemini(formatted_prompt)
-            elif self.provider == "openai":
-                response = await self._process_openai(formatted_prompt)
-            elif self.provider == "openrouter":
-                response = await self._process_openrouter(formatted_prompt)
-            else:
-                logging.error(f"Unsupported provider: {self.provider}")
-                return None
+            response = await self._generate(instructions, (message_text or "") + tail)
             
             if response:
-                # Use custom footer or default
-                footer = custom_footer or ""
-                
-                # Ensure total length doesn't exceed Telegram limits
-                final_text = response + footer
+                resp_len = len(response)
                 
                 # If it's a caption (with media), limit to 1020 characters (leaving space for "...")
                 # For text messages, limit to 4090 characters
-                if len(final_text) > 1020:
+                if resp_len + foot_len > 1020:
+                    max_response_length = 1020 - foot_len - 3  # Leave space for "..."
+                    
+                    # Prefer cutting at a sentence boundary over paying for a second LLM call
+                    trimmed = self._truncate_at_sentence(response, max_response_length)
+                    if trimmed:
+                        return trimmed + footer
+                    
                     # This is likely a caption, so summarize more aggressively
-                    if len(response) > 800:
+                    if resp_len > 800:
                         # Try to re-process with more aggressive summarization
-                        aggressive_prompt = """
-                        لطفاً متن زیر را به صورت بسیار خلاصه و مختصر در زبان فارسی بازنویسی کنید. متن نهایی باید حداکثر 700 کاراکتر باشد و نکات کلیدی را حفظ کند:
-
-                        متن اصلی: {original_text}
-
-                        لطفاً فقط متن خلاصه شده را ارائه دهید.
-                        """
-                        formatted_aggressive_prompt = aggressive_prompt.format(original_text=message_text)
-                        
-                        if self.provider == "gemini":
-                            shorter_response = await self._process_gemini(formatted_aggressive_prompt)
-                        elif self.provider == "openai":
-                            shorter_response = await self._process_openai(formatted_aggressive_prompt)
-                        elif self.provider == "openrouter":
-                            shorter_response = await self._process_openrouter(formatted_aggressive_prompt)
+                        aggressive_instructions, aggressive_tail = self._aggressive_parts
+                        shorter_response = await self._generate(
+                            aggressive_instructions, (message_text or "") + aggressive_tail
+                        )
                         
-                        if shorter_response:
-                            final_text = shorter_response + footer
-                            if len(final_text) <= 1020:
-                                return final_text
+                        if shorter_response and len(shorter_response) + foot_len <= 1020:
+                            return shorter_response + footer
                     
                     # If still too long, truncate
-                    max_response_length = 1020 - len(footer) - 3  # Leave space for "..."
-                    if len(response) > max_response_length:
+                    if resp_len > max_response_length:
                         response = response[:max_response_length] + "..."
-                    final_text = response + footer
                 
-                return final_text
+                return response + footer
             
             return None
             
         except Exception as e:
-            logging.error(f"Error processing message with {self.provider}: {e}")
+            logging.error("Error processing message with %s: %s", self.provider, e)
             return None
+    
+    @staticmethod
+    def _truncate_at_sentence(text: str, budget: int) -> Optional[str]:
+        """Cut text at the last sentence end within budget, or None if that loses too much."""
+        if budget <= 0:
+            return None
+        boundary = -1
+        for match in _SENTENCE_END.finditer(text, 0, budget):
+            boundary = match.end()
+        if boundary < 0.8 * budget:
+            return None
+        return text[:boundary].rstrip()
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _split_template(template: str) -> Tuple[str, str]:
+        """Split a template around {original_text} into its static instructions and tail.
+        
+        Cached, since the same mapping or session prompt is split for every message.
+        """
+        head, _, tail = template.partition("{original_text}")
+        return head, tail
+    
+    def _cache_key(self, instructions: str, content: str) -> str:
+        """Build the response cache key for a prompt."""
+        return hashlib.sha256(f"{self.provider}|{self.model_name}|{instructions}|{content}".encode('utf-8')).hexdigest()
+    
+    async def _generate(self, instructions: str, content: str) -> Optional[str]:
+        """Send a prompt to the provider, serving repeated prompts from the response cache."""
+        key = self._cache_key(instructions, content)
+        cached = self._cache.get(key)
+        if cached is not None:
+            stored_at, cached_response = cached
+            if time.monotonic() - stored_at < RESPONSE_CACHE_TTL:
+                self._cache.move_to_end(key)
+                return cached_response
+            del self._cache[key]
+        
+        response = await self._process_fn(instructions, content)
+        
+        if response:
+            self._cache[key] = (time.monotonic(), response)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return response
 
-
-    async def _process_gemini(self, prompt: str) -> Optional[str]:
+    async def _process_gemini(self, instructions: str, content: str) -> Optional[str]:
         """Process with Gemini."""
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
+            # Static instructions lead the prompt so Gemini's implicit prefix cache can hit
+            response = await self.model.generate_content_async(instructions + content)
             return response.text.strip()
         except Exception as e:
-            logging.error(f"Gemini processing error: {e}")
+            logging.error("Gemini processing error: %s", e)
             return None
     
-    async def _process_openai(self, prompt: str) -> Optional[str]:
+    @staticmethod
+    def _build_messages(instructions: str, content: str) -> list:
+        """Build chat messages with the static instructions in a cacheable system message."""
+        messages = []
+        if instructions.strip():
+            messages.append({"role": "system", "content": instructions.strip()})
+        messages.append({"role": "user", "content": content})
+        return messages
+    
+    async def _process_openai(self, instructions: str, content: str) -> Optional[str]:
         """Process with OpenAI."""
         try:
-            url = self.base_url or "https://api.openai.com/v1/chat/completions"
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "model": self.model_name,
-                "messages": [{"role": "user", "content": prompt}],
+                "messages": self._build_messages(instructions, content),
                 "max_tokens": 1000
             }
             
-            response = await asyncio.to_thread(requests.post, url, headers=headers, json=data)
+            response = await self._http.post(self._url, headers=self._headers, content=orjson.dumps(data))
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result['choices'][0]['message']['content'].strip()
             else:
-                logging.error(f"OpenAI API error: {response.status_code} - {response.text}")
+                logging.error("OpenAI API error: %s - %s", response.status_code, response.text)
                 return None
                 
         except Exception as e:
-            logging.error(f"OpenAI processing error: {e}")
+            logging.error("OpenAI processing error: %s", e)
             return None
     
-    async def _process_openrouter(self, prompt: str) -> Optional[str]:
+    async def _process_openrouter(self, instructions: str, content: str) -> Optional[str]:
         """Process with OpenRouter."""
         try:
-            if self.base_url.endswith('/chat/completions'):
-                url = self.base_url
-            elif self.base_url.endswith('/v1'):
-                url = f"{self.base_url}/chat/completions"
-            else:
-                url = f"{self.base_url}/v1/chat/completions"
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://github.com/your-repo",  # Optional
-                "X-Title": "Telegram Channel Processor"  # Optional
-            }
-            
             data = {
                 "model": self.model_name,
-                "messages": [{"role": "user", "content": prompt}]
+                "messages": self._build_messages(instructions, content)
             }
             
-            response = await asyncio.to_thread(requests.post, url, headers=headers, json=data)
+            response = await self._http.post(self._url, headers=self._headers, content=orjson.dumps(data))
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result['choices'][0]['message']['content'].strip()
             else:
-                logging.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                print(f"API Response: {response.text}")  # Add this line for debugging
+                logging.error("OpenRouter API error: %s - %s", response.status_code, response.text)
                 return None
                 
         except Exception as e:
-            logging.error(f"OpenRouter processing error: {e}")
+            logging.error("OpenRouter processing error: %s", e)
             return None
\ No newline at end of file
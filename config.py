@@ -1,11 +1,15 @@
-import json
+import asyncio
+import functools
+import os
+import threading
+import orjson
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, NamedTuple, Optional, Sequence, Tuple
+from dataclasses import dataclass, asdict, fields, MISSING
 import logging
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class ChannelMapping:
     """Configuration for source-target channel mapping."""
     id: str
@@ -13,13 +17,24 @@ class ChannelMapping:
     source_channel_name: str
     target_channel_id: int
     target_channel_name: str
-    keywords: List[str]
+    keywords: Sequence[str]
     signature: str
     prompt_template: Optional[str] = None
     custom_footer: Optional[str] = None
     use_ai_agent: bool = False
     ai_system_prompt: Optional[str] = None
     active: bool = True
+    
+    @property
+    def keywords_display(self) -> str:
+        """Keywords as a single comma-separated string for display."""
+        return ", ".join(self.keywords) if self.keywords else "None"
+
+@functools.lru_cache(maxsize=32)
+def parse_keywords(text: str) -> Tuple[str, ...]:
+    """Split a comma-separated keyword string into trimmed, non-empty keywords."""
+    return tuple(filter(None, map(str.strip, text.split(","))))
+
 
 @dataclass
 class SavedFooter:
@@ -28,7 +43,7 @@ class SavedFooter:
     content: str
     created_at: datetime
 
-@dataclass
+@dataclass(slots=True)
 class TelegramConfig:
     """Telegram API configuration."""
     api_id: str = ""
@@ -36,13 +51,49 @@ class TelegramConfig:
     phone_number: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class AIConfig:
     """AI configuration."""
     api_key: str = ""
     model: str = "gemini-pro"
     provider: str = "gemini"
     base_url: str = ""
+    min_ai_length: int = 20  # Shorter messages are forwarded as-is without an AI call
+    max_concurrent_requests: int = 4  # AI calls allowed in flight at once
+
+_FIELD_SPECS: Dict[type, list] = {}
+
+
+def _from_trusted_dict(cls, data: Dict[str, Any]):
+    """Build a dataclass from on-disk config data without going through __init__.
+    
+    Missing keys fall back to the field defaults; unknown keys are ignored.
+    """
+    specs = _FIELD_SPECS.get(cls)
+    if specs is None:
+        specs = _FIELD_SPECS[cls] = [(f.name, f.default, f.default_factory) for f in fields(cls)]
+    
+    obj = object.__new__(cls)
+    for name, default, default_factory in specs:
+        if name in data:
+            value = data[name]
+        elif default is not MISSING:
+            value = default
+        elif default_factory is not MISSING:
+            value = default_factory()
+        else:
+            raise TypeError(f"{cls.__name__} missing required field '{name}'")
+        object.__setattr__(obj, name, value)
+    return obj
+
+
+class ActiveMappingsView(NamedTuple):
+    """Active mappings laid out as parallel tuples for the monitoring loop."""
+    mappings: Tuple[ChannelMapping, ...]
+    ids: Tuple[str, ...]
+    source_ids: Tuple[int, ...]
+    by_source: Dict[int, Tuple[ChannelMapping, ...]]  # Source channel id -> mappings reading it
+
 
 class ConfigManager:
     """Manages application configuration."""
@@ -53,29 +104,33 @@ class ConfigManager:
         self.ai_config = AIConfig()
         self.channel_mappings: Dict[str, ChannelMapping] = {}
         self.saved_footers: List[SavedFooter] = []
+        self._active_cache: Optional[Tuple[ChannelMapping, ...]] = None
+        self._active_view: Optional[ActiveMappingsView] = None
+        self._save_lock = threading.Lock()
+        self._save_task: Optional[asyncio.Task] = None
         self.load_config()
     
     def load_config(self) -> None:
         """Load configuration from file."""
         try:
             if self.config_file.exists():
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
+                # orjson parses the UTF-8 bytes directly, skipping a str decode
+                config_data = orjson.loads(self.config_file.read_bytes())
                 
                 # Load Telegram config
                 if 'telegram' in config_data:
                     tg_data = config_data['telegram']
-                    self.telegram_config = TelegramConfig(**tg_data)
+                    self.telegram_config = _from_trusted_dict(TelegramConfig, tg_data)
                 
                 # Load AI config
                 if 'ai' in config_data:
                     ai_data = config_data['ai']
-                    self.ai_config = AIConfig(**ai_data)
+                    self.ai_config = _from_trusted_dict(AIConfig, ai_data)
                 
                 # Load channel mappings
                 if 'channel_mappings' in config_data:
                     for mapping_data in config_data['channel_mappings']:
-                        mapping = ChannelMapping(**mapping_data)
+                        mapping = _from_trusted_dict(ChannelMapping, mapping_data)
                         self.channel_mappings[mapping.id] = mapping
 
                 if 'saved_footers' in config_data:
@@ -87,13 +142,14 @@ class ConfigManager:
                         ) for footer in config_data['saved_footers']
                     ]
 
+                self._active_cache = None
                 logging.info("Configuration loaded successfully")
             else:
                 logging.info("No config file found, creating default configuration")
                 self.create_default_config()
                 
         except Exception as e:
-            logging.error(f"Error loading config: {e}")
+            logging.error("Error loading config: %s", e)
             self.create_default_config()
     
     def save_config(self) -> bool:
@@ -112,16 +168,37 @@ class ConfigManager:
                 ]
             }
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
+            # Mappings may have been edited in place (e.g. toggled active) before saving
+            self._active_cache = None
+            
+            # orjson emits UTF-8 directly, so Persian text stays readable without ensure_ascii.
+            # Write to a temp file and rename so a crash never leaves a torn config.json.
+            data = orjson.dumps(config_data, option=orjson.OPT_INDENT_2)
+            tmp_file = self.config_file.with_suffix('.tmp')
+            with self._save_lock:
+                tmp_file.write_bytes(data)
+                os.replace(tmp_file, self.config_file)
             
             logging.info("Configuration saved successfully")
             return True
             
         except Exception as e:
-            logging.error(f"Error saving config: {e}")
+            logging.error("Error saving config: %s", e)
             return False
     
+    async def save_config_async(self, delay: float = 0.2) -> bool:
+        """Save configuration off the event loop, coalescing saves requested within `delay`."""
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._delayed_save(delay))
+        return await asyncio.shield(self._save_task)
+    
+    async def _delayed_save(self, delay: float) -> bool:
+        """Wait out the debounce window, then write the config in a worker thread."""
+        await asyncio.sleep(delay)
+        # Edits made after this point schedule a fresh write instead of joining this one
+        self._save_task = None
+        return await asyncio.to_thread(self.save_config)
+    
     def create_default_config(self) -> None:
         """Create default configuration."""
 
@@ -144,23 +221,41 @@ class ConfigManager:
         """Add a new channel mapping."""
         try:
             self.channel_mappings[mapping.id] = mapping
+            self._active_cache = None
             return self.save_config()
         except Exception as e:
-            logging.error(f"Error adding channel mapping: {e}")
+            logging.error("Error adding channel mapping: %s", e)
             return False
     
     def remove_channel_mapping(self, mapping_id: str) -> bool:
         """Remove a channel mapping."""
         try:
-            if mapping_id in self.channel_mappings:
-                del self.channel_mappings[mapping_id]
+            if self.channel_mappings.pop(mapping_id, None) is not None:
+                self._active_cache = None
                 return self.save_config()
             return False
         except Exception as e:
-            logging.error(f"Error removing channel mapping: {e}")
+            logging.error("Error removing channel mapping: %s", e)
             return False
     
-    def get_active_mappings(self) -> List[ChannelMapping]:
-        """Get all active channel mappings."""
-        return [mapping for mapping in self.channel_mappings.values() if mapping.active]
+    def get_active_mappings(self) -> Tuple[ChannelMapping, ...]:
+        """Get all active channel mappings (cached until mappings change)."""
+        if self._active_cache is None:
+            self._active_cache = tuple(mapping for mapping in self.channel_mappings.values() if mapping.active)
+        return self._active_cache
+    
+    def get_active_mappings_view(self) -> ActiveMappingsView:
+        """Get the active mappings as parallel tuples, rebuilt along with the active cache."""
+        active = self.get_active_mappings()
+        if self._active_view is None or self._active_view.mappings is not active:
+            by_source: Dict[int, List[ChannelMapping]] = {}
+            for mapping in active:
+                by_source.setdefault(mapping.source_channel_id, []).append(mapping)
+            self._active_view = ActiveMappingsView(
+                mappings=active,
+                ids=tuple(mapping.id for mapping in active),
+                source_ids=tuple(mapping.source_channel_id for mapping in active),
+                by_source={source_id: tuple(group) for source_id, group in by_source.items()}
+            )
+        return self._active_view
 
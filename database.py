@@ -1,14 +1,40 @@
-# Add to database.py
-
+import functools
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Dict, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 import logging
+import orjson
+
+
+# TIMESTAMP columns round-trip as datetime objects. The adapter keeps the
+# existing "YYYY-MM-DD HH:MM:SS" layout (and replaces the default one deprecated in 3.12).
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: value != b"0")
+
+
+def _db_op(default, error: str):
+    """Log sqlite3 errors from a DatabaseManager method and return `default` instead.
+    
+    `default` may be a callable (e.g. `list`) so each failure gets a fresh value.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except sqlite3.Error as e:
+                logging.error("%s: %s", error, e)
+                return default() if callable(default) else default
+        return wrapper
+    return decorator
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessedMessage:
     """Data class for processed messages with media support."""
     original_message: str
@@ -28,280 +54,543 @@ class ProcessedMessage:
 class DatabaseManager:
     """Enhanced database manager with media support."""
     
+    # The media directory only needs creating once per process
+    _media_dir_created = False
+    
+    # Page cache for the single writer connection, in KiB (64 MiB)
+    WRITER_CACHE_KIB = 65536
+    
+    # Hot-path statements; identical text on every call lets sqlite3's statement cache reuse them.
+    # Saves are first-time inserts; an already stored message is left untouched
+    # (use update_processed_message to change one).
+    _SQL_SAVE_HEAD = """
+        INSERT OR IGNORE INTO processed_messages 
+        (message_id, source_channel_id, target_channel_id, mapping_id,
+         original_message, processed_message, date_received, date_processed,
+         has_media, media_type, media_path, media_file_id)
+        VALUES """
+    _SAVE_ROW = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    _SQL_SAVE = _SQL_SAVE_HEAD + _SAVE_ROW
+    
+    # Multi-row variants of _SQL_SAVE keyed by row count, largest first. 83 rows x 12
+    # parameters stays under SQLite's historical 999-variable limit.
+    _SQL_SAVE_BATCH = {
+        83: _SQL_SAVE_HEAD + ", ".join([_SAVE_ROW] * 83),
+        10: _SQL_SAVE_HEAD + ", ".join([_SAVE_ROW] * 10),
+        1: _SQL_SAVE,
+    }
+    
+    # Columns update_processed_message may change
+    _UPDATABLE_COLUMNS = frozenset({
+        'original_message', 'processed_message', 'has_media',
+        'media_type', 'media_path', 'media_file_id'
+    })
+    
+    # Columns named after ProcessedMessage fields so a row unpacks straight into the dataclass
+    _MESSAGE_COLUMNS = """
+        message_id, source_channel_id, target_channel_id, mapping_id,
+        original_message, processed_message, date_received AS date, posted,
+        has_media, media_type, media_path, media_file_id
+    """
+    
+    _SQL_UNPOSTED = f"""
+        SELECT {_MESSAGE_COLUMNS}
+        FROM processed_messages 
+        WHERE posted = 0 AND mapping_id = ?
+        ORDER BY date_received ASC 
+        LIMIT ?
+    """
+    
+    _SQL_SPECIFIC_UNPOSTED = f"""
+        SELECT {_MESSAGE_COLUMNS}
+        FROM processed_messages 
+        WHERE posted = 0 AND mapping_id = ? AND message_id = ?
+        LIMIT 1
+    """
+    
+    # Unposted rows newer than the mapping's last posted one, i.e. left behind by an
+    # interrupted or failed post rather than saved for later (historical backfill)
+    _SQL_STRANDED = f"""
+        SELECT {_MESSAGE_COLUMNS}
+        FROM processed_messages 
+        WHERE posted = 0 AND mapping_id = ? AND message_id > (
+            SELECT MAX(message_id) FROM processed_messages 
+            WHERE mapping_id = ? AND posted = 1
+        )
+        ORDER BY message_id ASC
+    """
+    
+    # True when the mapping's posting interval has elapsed at the bound time;
+    # the date math stays in SQLite so last_post_time is never parsed in Python
+    _SQL_INTERVAL_ELAPSED = "(julianday(?) - julianday(last_post_time)) * 24 >= post_interval_hours"
+    
+    _SQL_MARK_POSTED = """
+        UPDATE processed_messages 
+        SET posted = 1, date_posted = ? 
+        WHERE message_id = ? AND mapping_id = ?
+    """
+    
+    # Indexes for the hot read paths, by name (posting_schedule.mapping_id is already
+    # covered by its UNIQUE)
+    _SECONDARY_INDEXES = {
+        "idx_unposted": """
+            CREATE INDEX IF NOT EXISTS idx_unposted
+            ON processed_messages(mapping_id, posted, date_received)
+        """,
+        "idx_msg_source_map": """
+            CREATE INDEX IF NOT EXISTS idx_msg_source_map
+            ON processed_messages(source_channel_id, mapping_id, message_id DESC)
+        """,
+        "idx_pm_posted_date": """
+            CREATE INDEX IF NOT EXISTS idx_pm_posted_date
+            ON processed_messages(posted, date_posted)
+        """,
+        "idx_pm_unposted": """
+            CREATE INDEX IF NOT EXISTS idx_pm_unposted
+            ON processed_messages(posted, date_received DESC)
+        """,
+        "idx_pm_date_received": """
+            CREATE INDEX IF NOT EXISTS idx_pm_date_received
+            ON processed_messages(date_received DESC)
+        """,
+    }
+    
+    _SQL_LAST_ID = """
+        SELECT MAX(message_id) FROM processed_messages 
+        WHERE source_channel_id = ? AND mapping_id = ?
+    """
+    
     def __init__(self, db_path: str = "telegram_messages.db"):
         self.db_path = Path(db_path)
         self.media_dir = Path("media")
-        self.media_dir.mkdir(exist_ok=True)
+        if not DatabaseManager._media_dir_created:
+            self.media_dir.mkdir(exist_ok=True)
+            DatabaseManager._media_dir_created = True
+        # WAL allows one writer alongside any number of readers: every write goes
+        # through the single writer connection under a lock, reads use per-thread connections
+        self._writer = self._open()
+        # Only the writer gets the large page cache; readers are opened per thread,
+        # so a large per-connection cap would multiply across worker pools
+        self._writer.execute(f"PRAGMA cache_size=-{self.WRITER_CACHE_KIB}")
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
         self.init_database()
     
+    def _open(self) -> sqlite3.Connection:
+        """Open and tune a long-lived connection."""
+        # Autocommit mode: each statement commits on its own, no implicit transactions
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=256, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn)
+        return conn
+    
+    def connect(self) -> sqlite3.Connection:
+        """Open a separate connection with the standard pragmas applied.
+        
+        For callers that manage their own transactions. Unlike the internal
+        connections it keeps sqlite3's default transaction handling and row types.
+        """
+        conn = sqlite3.connect(self.db_path)
+        self._apply_pragmas(conn)
+        return conn
+    
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's read connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            # Readers never write; query_only turns any stray write into an error
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+    
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's persistent read connection.
+        
+        For callers outside this class (e.g. the GUI) that run their own read-only
+        queries; writes should go through the DatabaseManager methods.
+        """
+        return self._conn()
+    
+    def data_version(self) -> int:
+        """Return a counter that changes whenever any connection commits a write.
+        
+        Callers can cache query results and re-run them only when this changes.
+        """
+        return self._conn().execute("PRAGMA data_version").fetchone()[0]
+    
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the shared writer connection."""
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            with self._writer:  # Commits on success, rolls back on error
+                yield self._writer
+    
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection) -> None:
+        """Tune a freshly opened connection; runs once per connection lifetime."""
+        # Lets vacuum() free pages incrementally. Must precede journal_mode and only
+        # takes effect on a new, empty database; older files are converted by vacuum().
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")  # Persistent once set, but cheap to re-assert
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA busy_timeout=30000")
+    
     def init_database(self) -> None:
         """Initialize the database with required tables including media support."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Add database optimization settings
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA busy_timeout=30000")
-            
-            # Enhanced processed_messages table with media fields
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS processed_messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message_id INTEGER,
-                    source_channel_id INTEGER,
-                    target_channel_id INTEGER,
-                    mapping_id TEXT,
-                    original_message TEXT,
-                    processed_message TEXT,
-                    date_received TIMESTAMP,
-                    date_processed TIMESTAMP,
-                    posted BOOLEAN DEFAULT 0,
-                    date_posted TIMESTAMP,
-                    has_media BOOLEAN DEFAULT 0,
-                    media_type TEXT,
-                    media_path TEXT,
-                    media_file_id TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(message_id, source_channel_id, target_channel_id)
-                )
-            """)
-            
-            # Check if media columns exist, add them if not (for existing databases)
-            cursor.execute("PRAGMA table_info(processed_messages)")
-            table_info = cursor.fetchall()
-            columns = [column[1] for column in table_info if len(column) > 1]
-            
-            if 'has_media' not in columns:
-                cursor.execute("ALTER TABLE processed_messages ADD COLUMN has_media BOOLEAN DEFAULT 0")
-            if 'media_type' not in columns:
-                cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_type TEXT")
-            if 'media_path' not in columns:
-                cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_path TEXT")
-            if 'media_file_id' not in columns:
-                cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_file_id TEXT")
-            
-            # Other existing tables remain the same
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS posting_schedule (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    mapping_id TEXT UNIQUE,
-                    last_post_time TIMESTAMP,
-                    messages_posted_today INTEGER DEFAULT 0,
-                    post_interval_hours INTEGER DEFAULT 12,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS channels (
-                    id INTEGER PRIMARY KEY,
-                    channel_id INTEGER UNIQUE,
-                    channel_name TEXT,
-                    channel_type TEXT,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
+        conn = self._writer
+        cursor = conn.cursor()
+        
+        # Enhanced processed_messages table with media fields
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS processed_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message_id INTEGER,
+                source_channel_id INTEGER,
+                target_channel_id INTEGER,
+                mapping_id TEXT,
+                original_message TEXT,
+                processed_message TEXT,
+                date_received TIMESTAMP,
+                date_processed TIMESTAMP,
+                posted BOOLEAN DEFAULT 0,
+                date_posted TIMESTAMP,
+                has_media BOOLEAN DEFAULT 0,
+                media_type TEXT,
+                media_path TEXT,
+                media_file_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(message_id, source_channel_id, target_channel_id)
+            )
+        """)
+        
+        # Schema migrations run once per database, tracked in PRAGMA user_version
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # v1: media columns for databases created before media support
+            cursor.execute("BEGIN IMMEDIATE")
+            with conn:  # Commits on success, rolls back on error
+                cursor.execute("PRAGMA table_info(processed_messages)")
+                columns = [column[1] for column in cursor.fetchall()]
+                
+                if 'has_media' not in columns:
+                    cursor.execute("ALTER TABLE processed_messages ADD COLUMN has_media BOOLEAN DEFAULT 0")
+                if 'media_type' not in columns:
+                    cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_type TEXT")
+                if 'media_path' not in columns:
+                    cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_path TEXT")
+                if 'media_file_id' not in columns:
+                    cursor.execute("ALTER TABLE processed_messages ADD COLUMN media_file_id TEXT")
+                
+                cursor.execute("PRAGMA user_version = 1")
+        
+        # Other existing tables remain the same
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS posting_schedule (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mapping_id TEXT UNIQUE,
+                last_post_time TIMESTAMP,
+                messages_posted_today INTEGER DEFAULT 0,
+                post_interval_hours INTEGER DEFAULT 12,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS channels (
+                id INTEGER PRIMARY KEY,
+                channel_id INTEGER UNIQUE,
+                channel_name TEXT,
+                channel_type TEXT,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        for index_sql in self._SECONDARY_INDEXES.values():
+            cursor.execute(index_sql)
+        
+        # Give the planner statistics: a full ANALYZE the first time, then let
+        # PRAGMA optimize refresh only the tables whose stats have gone stale
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            cursor.execute("ANALYZE")
+        else:
+            cursor.execute("PRAGMA optimize")
  
+    @_db_op(False, "Error saving message to database")
     def save_processed_message(self, message: ProcessedMessage) -> bool:
         """Save a processed message with media support to the database."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO processed_messages 
-                    (message_id, source_channel_id, target_channel_id, mapping_id,
-                     original_message, processed_message, date_received, date_processed,
-                     has_media, media_type, media_path, media_file_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    message.message_id,
-                    message.source_channel_id,
-                    message.target_channel_id,
-                    message.mapping_id,
-                    message.original_message,
-                    message.processed_message,
-                    message.date,
-                    datetime.now(),
-                    message.has_media,
-                    message.media_type,
-                    message.media_path,
-                    message.media_file_id
-                ))
-                conn.commit()
-                return True
-        except Exception as e:
-            logging.error(f"Error saving message to database: {e}")
+        with self._write() as conn:
+            conn.execute(self._SQL_SAVE, self._save_params(message, datetime.now()))
+        return True
+    
+    @_db_op(False, "Error updating message in database")
+    def update_processed_message(self, message_id: int, mapping_id: str, **fields) -> bool:
+        """Update selected columns of a stored message; returns False if no row matched."""
+        unknown = fields.keys() - self._UPDATABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot update columns: {', '.join(sorted(unknown))}")
+        if not fields:
             return False
+        
+        columns = sorted(fields)
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        params = [fields[column] for column in columns] + [datetime.now(), message_id, mapping_id]
+        with self._write() as conn:
+            cursor = conn.execute(f"""
+                UPDATE processed_messages 
+                SET {assignments}, date_processed = ? 
+                WHERE message_id = ? AND mapping_id = ?
+            """, params)
+        return cursor.rowcount > 0
+    
+    @_db_op(0, "Error saving message batch to database")
+    def save_processed_messages_batch(self, messages: List[ProcessedMessage]) -> int:
+        """Save many processed messages in a single transaction; returns the number inserted.
+        
+        Rows already stored are ignored and not counted.
+        """
+        if not messages:
+            return 0
+        now = datetime.now()
+        rows = [self._save_params(message, now) for message in messages]
+        with self._write() as conn:
+            before = conn.total_changes
+            # Each statement inserts the largest precompiled block of rows that still fits
+            start = 0
+            while start < len(rows):
+                count = next(k for k in self._SQL_SAVE_BATCH if k <= len(rows) - start)
+                params = [value for row in rows[start:start + count] for value in row]
+                conn.execute(self._SQL_SAVE_BATCH[count], params)
+                start += count
+            inserted = conn.total_changes - before
+        return inserted
+    
+    @_db_op(list, "Error saving new messages to database")
+    def save_new_messages(self, messages: List[ProcessedMessage]) -> List[ProcessedMessage]:
+        """Save messages in a single transaction; returns only those not already stored."""
+        if not messages:
+            return []
+        now = datetime.now()
+        inserted = []
+        with self._write() as conn:
+            for message in messages:
+                if conn.execute(self._SQL_SAVE, self._save_params(message, now)).rowcount == 1:
+                    inserted.append(message)
+        return inserted
     
+    @staticmethod
+    def _save_params(message: ProcessedMessage, date_processed: datetime) -> tuple:
+        """Bind parameters for _SQL_SAVE."""
+        return (
+            message.message_id,
+            message.source_channel_id,
+            message.target_channel_id,
+            message.mapping_id,
+            message.original_message,
+            message.processed_message,
+            message.date,
+            date_processed,
+            message.has_media,
+            message.media_type,
+            message.media_path,
+            message.media_file_id
+        )
+    
+    @_db_op(list, "Error getting unposted messages")
     def get_unposted_messages(self, mapping_id: str, limit: int = 1) -> List[ProcessedMessage]:
         """Get unposted messages for a specific mapping with media info."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT message_id, source_channel_id, target_channel_id, mapping_id,
-                           original_message, processed_message, date_received, posted,
-                           has_media, media_type, media_path, media_file_id
-                    FROM processed_messages 
-                    WHERE posted = 0 AND mapping_id = ?
-                    ORDER BY date_received ASC 
-                    LIMIT ?
-                """, (mapping_id, limit))
-                
-                messages = []
-                for row in cursor.fetchall():
-                    messages.append(ProcessedMessage(
-                        message_id=row[0],
-                        source_channel_id=row[1],
-                        target_channel_id=row[2],
-                        mapping_id=row[3],
-                        original_message=row[4],
-                        processed_message=row[5],
-                        date=datetime.fromisoformat(row[6]) if row[6] else datetime.now(),
-                        posted=bool(row[7]),
-                        has_media=bool(row[8]) if row[8] is not None else False,
-                        media_type=row[9],
-                        media_path=row[10],
-                        media_file_id=row[11]
-                    ))
-                return messages
-        except Exception as e:
-            logging.error(f"Error getting unposted messages: {e}")
-            return []
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute(self._SQL_UNPOSTED, (mapping_id, limit))
+        
+        return [ProcessedMessage(**row) for row in cursor.fetchall()]
     
+    @_db_op(list, "Error getting stranded messages")
+    def get_stranded_messages(self, mapping_id: str) -> List[ProcessedMessage]:
+        """Get unposted messages newer than the mapping's last posted one, oldest first."""
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute(self._SQL_STRANDED, (mapping_id, mapping_id))
+        
+        return [ProcessedMessage(**row) for row in cursor.fetchall()]
+    
+    @_db_op(False, "Error marking message as posted")
     def mark_as_posted(self, message_id: int, mapping_id: str) -> bool:
         """Mark a message as posted."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE processed_messages 
-                    SET posted = 1, date_posted = ? 
-                    WHERE message_id = ? AND mapping_id = ?
-                """, (datetime.now(), message_id, mapping_id))
-                conn.commit()
-                return True
-        except Exception as e:
-            logging.error(f"Error marking message as posted: {e}")
-            return False
+        with self._write() as conn:
+            conn.execute(self._SQL_MARK_POSTED, (datetime.now(), message_id, mapping_id))
+        return True
+    
+    @_db_op(False, "Error marking messages as posted")
+    def mark_many_as_posted(self, pairs: List[Tuple[int, str]]) -> bool:
+        """Mark several (message_id, mapping_id) pairs as posted in one transaction."""
+        if not pairs:
+            return True
+        now = datetime.now()
+        params = [(now, message_id, mapping_id) for message_id, mapping_id in pairs]
+        with self._write() as conn:
+            conn.executemany(self._SQL_MARK_POSTED, params)
+        return True
     
+    @_db_op(None, "Error getting last message ID")
     def get_last_message_id(self, source_channel_id: int, mapping_id: str) -> Optional[int]:
         """Get the last processed message ID for a channel mapping."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT MAX(message_id) FROM processed_messages 
-                    WHERE source_channel_id = ? AND mapping_id = ?
-                """, (source_channel_id, mapping_id))
-                result = cursor.fetchone()[0]
-                return result
-        except Exception as e:
-            logging.error(f"Error getting last message ID: {e}")
-            return None
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute(self._SQL_LAST_ID, (source_channel_id, mapping_id))
+        result = cursor.fetchone()[0]
+        return result
     
+    @_db_op(False, "Error checking post schedule")
     def should_post_now(self, mapping_id: str) -> bool:
-        """Check if it's time to post for a specific mapping."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT last_post_time, post_interval_hours 
-                    FROM posting_schedule 
-                    WHERE mapping_id = ?
-                """, (mapping_id,))
-                
-                result = cursor.fetchone()
-                if not result:
-                    # Create initial schedule
-                    cursor.execute("""
-                        INSERT INTO posting_schedule (mapping_id, last_post_time, post_interval_hours)
-                        VALUES (?, ?, 12)
-                    """, (mapping_id, datetime.now() - timedelta(hours=12)))
-                    conn.commit()
-                    return True
-                
-                last_post_time = datetime.fromisoformat(result[0])
-                interval_hours = result[1]
-                return datetime.now() - last_post_time >= timedelta(hours=interval_hours)
-                
-        except Exception as e:
-            logging.error(f"Error checking post schedule: {e}")
-            return False
+        """Check, without claiming it, whether the mapping's posting interval has elapsed.
+        
+        A mapping without a schedule row may post immediately, as with try_claim_post_slot.
+        """
+        conn = self._conn()
+        row = conn.execute(f"""
+            SELECT {self._SQL_INTERVAL_ELAPSED} FROM posting_schedule WHERE mapping_id = ?
+        """, (datetime.now(), mapping_id)).fetchone()
+        return row is None or bool(row[0])
     
-    def update_post_schedule(self, mapping_id: str) -> None:
-        """Update the posting schedule for a mapping."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO posting_schedule 
-                    (mapping_id, last_post_time, messages_posted_today)
-                    VALUES (?, ?, COALESCE((SELECT messages_posted_today FROM posting_schedule WHERE mapping_id = ?), 0) + 1)
-                """, (mapping_id, datetime.now(), mapping_id))
-                conn.commit()
-        except Exception as e:
-            logging.error(f"Error updating post schedule: {e}")
+    @_db_op(False, "Error claiming post slot")
+    def try_claim_post_slot(self, mapping_id: str) -> bool:
+        """Atomically check the posting interval and, if it has elapsed, record a post.
+        
+        Returns True when the caller may post now. A mapping without a schedule
+        row gets one on its first claim and is allowed to post immediately.
+        """
+        now = datetime.now()
+        with self._write() as conn:
+            # RETURNING only yields a row when the insert or the guarded update actually happened
+            claimed = conn.execute(f"""
+                INSERT INTO posting_schedule 
+                (mapping_id, last_post_time, messages_posted_today, post_interval_hours)
+                VALUES (?, ?, 1, 12)
+                ON CONFLICT(mapping_id) DO UPDATE SET
+                    last_post_time = excluded.last_post_time,
+                    messages_posted_today = messages_posted_today + 1
+                WHERE {self._SQL_INTERVAL_ELAPSED}
+                RETURNING id
+            """, (mapping_id, now, now)).fetchone()
+        return claimed is not None
+    
+    @_db_op(False, "Error releasing post slot")
+    def release_post_slot(self, mapping_id: str) -> bool:
+        """Give back the slot taken by try_claim_post_slot when the post then failed."""
+        with self._write() as conn:
+            # Moving the claim back one full interval makes the slot available again
+            conn.execute("""
+                UPDATE posting_schedule 
+                SET last_post_time = datetime(julianday(last_post_time) - post_interval_hours / 24.0),
+                    messages_posted_today = MAX(messages_posted_today - 1, 0)
+                WHERE mapping_id = ?
+            """, (mapping_id,))
+        return True
+    
+    @_db_op(False, "Error clearing post schedules")
+    def clear_post_schedules(self) -> bool:
+        """Delete every posting schedule."""
+        with self._write() as conn:
+            conn.execute("DELETE FROM posting_schedule")
+        return True
+    
+    @_db_op(None, "Error deleting posted messages")
+    def delete_posted_messages(self) -> Optional[int]:
+        """Delete every posted message; returns the number of rows removed."""
+        with self._write() as conn:
+            return conn.execute("DELETE FROM processed_messages WHERE posted = 1").rowcount
+    
+    @_db_op(False, "Error deleting messages")
+    def delete_messages(self, row_ids: List[int]) -> bool:
+        """Delete processed messages by row id in one transaction."""
+        if not row_ids:
+            return True
+        with self._write() as conn:
+            conn.executemany("DELETE FROM processed_messages WHERE id = ?", [(row_id,) for row_id in row_ids])
+        return True
+    
+    @_db_op(False, "Error vacuuming database")
+    def vacuum(self, max_pages: int = 1000) -> bool:
+        """Return up to max_pages free pages to the filesystem."""
+        # Neither statement can run inside a transaction, so both bypass _write()'s BEGIN
+        with self._write_lock:
+            conn = self._writer
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # One-time full rebuild switches an older database to incremental mode
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            else:
+                # The pragma frees one page per step and execute() only steps once;
+                # executescript runs it to completion
+                conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        return True
     
+    @_db_op(None, "Error saving channel info")
     def save_channel_info(self, channel_id: int, channel_name: str, channel_type: str) -> None:
         """Save channel information."""
+        with self._write() as conn:
+            conn.execute("""
+                INSERT INTO channels 
+                (channel_id, channel_name, channel_type, last_updated)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    channel_type = excluded.channel_type,
+                    last_updated = excluded.last_updated
+            """, (channel_id, channel_name, channel_type, datetime.now()))
+    
+    def iter_channels(self) -> Iterator[sqlite3.Row]:
+        """Stream saved channel rows; each row exposes 'id', 'name' and 'type'."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO channels 
-                    (channel_id, channel_name, channel_type, last_updated)
-                    VALUES (?, ?, ?, ?)
-                """, (channel_id, channel_name, channel_type, datetime.now()))
-                conn.commit()
-        except Exception as e:
-            logging.error(f"Error saving channel info: {e}")
+            cursor = self._conn().execute(
+                "SELECT channel_id AS id, channel_name AS name, channel_type AS type FROM channels"
+            )
+            yield from cursor
+        except sqlite3.Error as e:
+            # A generator can't use _db_op: errors surface during iteration, not the call
+            logging.error("Error getting channels: %s", e)
     
     def get_all_channels(self) -> List[Dict]:
         """Get all saved channel information."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT channel_id, channel_name, channel_type FROM channels")
-                return [{'id': row[0], 'name': row[1], 'type': row[2]} for row in cursor.fetchall()]
-        except Exception as e:
-            logging.error(f"Error getting channels: {e}")
-            return []
+        return [dict(row) for row in self.iter_channels()]
+    
+    # Rows between export progress callbacks
+    EXPORT_PROGRESS_EVERY = 1000
+    
+    @_db_op(None, "Error exporting messages")
+    def export_messages(self, path, progress: Optional[Callable[[int], None]] = None) -> Optional[int]:
+        """Stream every processed message to a JSON array file; returns the row count.
+        
+        Rows are read from the cursor and written one at a time, so memory use doesn't
+        grow with the table. File errors (OSError) propagate to the caller.
+        """
+        cursor = self._conn().execute("SELECT * FROM processed_messages ORDER BY id")
+        count = 0
+        with open(path, 'wb') as out:
+            out.write(b"[")
+            for row in cursor:
+                if count:
+                    out.write(b",\n")
+                out.write(orjson.dumps(dict(row)))
+                count += 1
+                if progress and count % self.EXPORT_PROGRESS_EVERY == 0:
+                    progress(count)
+            out.write(b"]\n")
+        return count
         
 
+    @_db_op(None, "Error getting specific unposted message")
     def get_specific_unposted_message(self, mapping_id: str, message_id: int) -> Optional[ProcessedMessage]:
         """Get a specific unposted message by mapping_id and message_id."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT message_id, source_channel_id, target_channel_id, mapping_id,
-                        original_message, processed_message, date_received, posted,
-                        has_media, media_type, media_path, media_file_id
-                    FROM processed_messages 
-                    WHERE posted = 0 AND mapping_id = ? AND message_id = ?
-                    LIMIT 1
-                """, (mapping_id, message_id))
-                
-                row = cursor.fetchone()
-                if row:
-                    return ProcessedMessage(
-                        message_id=row[0],
-                        source_channel_id=row[1],
-                        target_channel_id=row[2],
-                        mapping_id=row[3],
-                        original_message=row[4],
-                        processed_message=row[5],
-                        date=datetime.fromisoformat(row[6]) if row[6] else datetime.now(),
-                        posted=bool(row[7]),
-                        has_media=bool(row[8]) if row[8] is not None else False,
-                        media_type=row[9],
-                        media_path=row[10],
-                        media_file_id=row[11]
-                    )
-                return None
-        except Exception as e:
-            logging.error(f"Error getting specific unposted message: {e}")
-            return None  
\ No newline at end of file
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute(self._SQL_SPECIFIC_UNPOSTED, (mapping_id, message_id))
+        
+        row = cursor.fetchone()
+        return ProcessedMessage(**row) if row else None
\ No newline at end of file
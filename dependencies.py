@@ -0,0 +1,26 @@
+import importlib.util
+from typing import Dict, List, Optional
+
+# Package name -> importable module, checked with find_spec before anything heavy loads.
+# sqlite3 ships with Python and needs no check.
+REQUIRED_PACKAGES = {
+    "telethon": "telethon",
+    "google-generativeai": "google.generativeai",
+    "httpx": "httpx",
+    "orjson": "orjson",
+}
+
+
+def find_missing_packages(extra: Optional[Dict[str, str]] = None) -> List[str]:
+    """Return the required (plus `extra`) packages that can't be found, without importing them."""
+    packages = {**REQUIRED_PACKAGES, **(extra or {})}
+    missing = []
+    for package, module in packages.items():
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ImportError:
+            # Raised when a parent package (e.g. "google") is missing
+            found = False
+        if not found:
+            missing.append(package)
+    return missing
@@ -12,29 +12,12 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+from dependencies import find_missing_packages
+
 def check_dependencies():
     """Check if required packages are installed"""
-    required_packages = [
-        "telethon",
-        "google-generativeai",
-        "sqlite3",
-        "tkinter"
-    ]
-    
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            if package == "tkinter":
-                import tkinter
-            elif package == "telethon":
-                import telethon
-            elif package == "google-generativeai":
-                import google.generativeai
-            elif package == "sqlite3":
-                import sqlite3
-        except ImportError:
-            missing_packages.append(package)
+    # tkinter is only needed by the GUI, on top of the shared requirements
+    missing_packages = find_missing_packages({"tkinter": "tkinter"})
     
     if missing_packages:
         print("Missing required packages:")
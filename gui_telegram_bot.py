@@ -1,18 +1,169 @@
+try:
+    import tkthread  # Optional: lets worker threads call into Tk directly
+    tkthread.patch()  # Must run before tkinter creates its interpreter
+except ImportError:
+    tkthread = None
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
+import tkinter.font as tkfont
 import asyncio
 import threading
+import time
+from concurrent.futures import Future
 from typing import Optional
 import json
-from datetime import datetime
 import os
 from pathlib import Path
 
+try:
+    import uvloop  # Optional: faster event loop where available
+except ImportError:
+    uvloop = None
+
 # Import your existing modules
-from config import ConfigManager, ChannelMapping, TelegramConfig, AIConfig
+from config import ConfigManager, ChannelMapping, TelegramConfig, AIConfig, parse_keywords
 from main_processor import MultiChannelProcessor
 from database import DatabaseManager
 
+
+class LazyTreeview(ttk.Treeview):
+    """Treeview that inserts its rows a page at a time as the user scrolls.
+    
+    Only the first page is inserted up front; the next one is appended whenever the
+    view nears the bottom, so large tables open without a long insert loop.
+    
+    With key_column set, each row's item id is the value in that column and
+    set_rows updates the table in place, touching only rows that changed.
+    """
+    
+    PAGE_SIZE = 100
+    
+    def __init__(self, master=None, key_column=None, **kw):
+        self._yscroll_callback = kw.pop('yscrollcommand', None)
+        super().__init__(master, yscrollcommand=self._on_yview, **kw)
+        self._key_column = key_column
+        self._rows = ()
+        self._loaded = 0
+    
+    def configure(self, cnf=None, **kw):
+        """Keep our scroll hook installed and forward to any yscrollcommand given"""
+        if 'yscrollcommand' in kw:
+            self._yscroll_callback = kw.pop('yscrollcommand')
+        return super().configure(cnf, **kw)
+    
+    config = configure
+    
+    def set_rows(self, rows):
+        """Replace the table contents with a sequence of value tuples"""
+        if self._key_column is not None and self._loaded:
+            self._sync_rows(rows)
+            return
+        self.delete(*self.get_children())
+        self._rows = rows
+        self._loaded = 0
+        self._load_more()
+    
+    def _sync_rows(self, rows):
+        """Diff keyed rows against the loaded ones: update, insert, delete and reorder"""
+        key = self._key_column
+        previous = {str(values[key]): values for values in self._rows[:self._loaded]}
+        loaded = min(max(self._loaded, self.PAGE_SIZE), len(rows))
+        order = [str(values[key]) for values in rows[:loaded]]
+        
+        stale = previous.keys() - set(order)
+        if stale:
+            self.delete(*stale)
+        for iid, values in zip(order, rows):
+            old = previous.get(iid)
+            if old is None:
+                self.insert('', 'end', iid=iid, values=values)
+            elif old != values:
+                self.item(iid, values=values)
+        
+        if list(self.get_children()) != order:
+            for index, iid in enumerate(order):
+                self.move(iid, '', index)
+        
+        self._rows = rows
+        self._loaded = loaded
+    
+    def _load_more(self):
+        end = min(self._loaded + self.PAGE_SIZE, len(self._rows))
+        key = self._key_column
+        for values in self._rows[self._loaded:end]:
+            if key is None:
+                self.insert('', 'end', values=values)
+            else:
+                self.insert('', 'end', iid=str(values[key]), values=values)
+        self._loaded = end
+    
+    def _on_yview(self, first, last):
+        if self._yscroll_callback:
+            self._yscroll_callback(first, last)
+        if float(last) >= 0.9 and self._loaded < len(self._rows):
+            self._load_more()
+
+
+# Status bar and log writes are coalesced and flushed at most this often (ms)
+STATUS_FLUSH_MS = 50
+LOG_FLUSH_MS = 100
+
+_TS_FMT = "%H:%M:%S"  # Log line timestamp format
+
+# Hot GUI queries. Identical SQL text lets sqlite3's per-connection statement
+# cache hand back the already prepared statement on every refresh.
+_SQL_DASHBOARD_COUNTS = """
+    SELECT COUNT(*),
+           COALESCE(SUM(CASE WHEN posted = 0 THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN posted = 1 AND date(date_posted) = date('now') THEN 1 ELSE 0 END), 0)
+    FROM processed_messages
+"""
+
+# Previews are cut in SQL so full message bodies never leave SQLite
+_SQL_RECENT_ACTIVITY = """
+    SELECT date_received, mapping_id, posted,
+           CASE WHEN length(original_message) > 50
+                THEN substr(original_message, 1, 50) || '...'
+                ELSE original_message END
+    FROM processed_messages 
+    ORDER BY date_received DESC 
+    LIMIT 20
+"""
+
+# All three message counts come from one scan of the covering idx_pm_posted_date
+# index; the channels count is answered from the channels primary key index
+_SQL_DATABASE_COUNTS = """
+    SELECT COUNT(*),
+           COALESCE(SUM(posted = 1), 0),
+           COALESCE(SUM(posted = 0), 0),
+           (SELECT COUNT(*) FROM channels)
+    FROM processed_messages
+"""
+
+# Unposted messages, newest first, one page at a time. Later pages continue after
+# the last (date_received, id) shown, so each page is a short idx_pm_unposted scan.
+UNPOSTED_PAGE_SIZE = 200
+
+_SQL_UNPOSTED_SELECT = """
+    SELECT id, mapping_id, message_id,
+           CASE WHEN length(original_message) > 80
+                THEN substr(original_message, 1, 80) || '...'
+                ELSE original_message END,
+           date_received
+    FROM processed_messages
+"""
+_SQL_UNPOSTED_FIRST_PAGE = _SQL_UNPOSTED_SELECT + """
+    WHERE posted = 0
+    ORDER BY date_received DESC, id DESC
+    LIMIT ?
+"""
+_SQL_UNPOSTED_NEXT_PAGE = _SQL_UNPOSTED_SELECT + """
+    WHERE posted = 0 AND (date_received, id) < (?, ?)
+    ORDER BY date_received DESC, id DESC
+    LIMIT ?
+"""
+
+
 class ModernTelegramBotGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -24,8 +175,31 @@ class ModernTelegramBotGUI:
         self.config_manager = ConfigManager()
         self.db_manager = DatabaseManager()
         self.processor: Optional[MultiChannelProcessor] = None
-        self.monitoring_thread = None
+        self.monitoring_task: Optional[Future] = None
         self.is_monitoring = False
+        self._stop_evt = asyncio.Event()  # Set by stop_processing to wake the monitor loop
+        
+        # Background work runs on one asyncio loop in its own thread; coroutines hand
+        # UI updates back to Tk with root.after
+        self.loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        
+        # Derived mapping data is rebuilt only when the config version changes
+        self._config_version = 0
+        self._mapping_cache = None
+        
+        # (data_version, stats) for the database panel; reused until something commits
+        self._db_stats_cache = None
+        
+        # Content panels are built on first visit and kept for later navigation
+        self._panels = {}
+        
+        # Pending status text / log lines, written to the widgets on the next flush
+        self._status_pending = None
+        self._status_scheduled = False
+        self._log_pending = []
+        self._log_scheduled = False
         
         # Color scheme - Modern minimal
         self.colors = {
@@ -42,21 +216,56 @@ class ModernTelegramBotGUI:
         
         self.setup_styles()
         self.setup_gui()
-        self.load_initial_data()
+        # Deferred until Tk is idle so the first paint isn't held up
+        self.root.after_idle(self.load_initial_data)
+        
+    def call_in_tk(self, func, *args):
+        """Run a UI update from any thread.
+        
+        With tkthread installed Tk is safe to call from worker threads, so the update
+        runs directly; otherwise it is queued onto the Tk event loop.
+        """
+        if tkthread:
+            func(*args)
+        else:
+            self.root.after(0, func, *args)
+    
+    def run_async(self, coro) -> Future:
+        """Schedule a coroutine on the background asyncio loop (safe from the Tk thread)"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def load_rows_in_background(self, prepare, apply):
+        """Build table rows in a worker thread, then hand them to the Tk thread in one go"""
+        self.run_async(self._load_rows(prepare, apply))
+    
+    async def _load_rows(self, prepare, apply):
+        rows = await asyncio.to_thread(prepare)
+        self.root.after(0, apply, rows)
         
     def setup_styles(self):
         """Setup modern styling"""
         style = ttk.Style()
         style.theme_use('clam')
         
+        # Named fonts are created once and shared by every widget that uses them
+        self.fonts = {
+            'title': tkfont.Font(family='Segoe UI', size=16, weight='bold'),
+            'brand': tkfont.Font(family='Segoe UI', size=14, weight='bold'),
+            'body': tkfont.Font(family='Segoe UI', size=10),
+            'small': tkfont.Font(family='Segoe UI', size=9),
+            'indicator': tkfont.Font(family='Segoe UI', size=12),
+            'stat_value': tkfont.Font(family='Segoe UI', size=24, weight='bold'),
+            'mono': tkfont.Font(family='Consolas', size=10),
+        }
+        
         # Configure styles
         style.configure('Sidebar.TFrame', background=self.colors['sidebar'])
         style.configure('Main.TFrame', background=self.colors['bg'])
-        style.configure('Title.TLabel', font=('Segoe UI', 16, 'bold'), background=self.colors['bg'])
-        style.configure('Subtitle.TLabel', font=('Segoe UI', 10), foreground=self.colors['text_light'], background=self.colors['bg'])
-        style.configure('Primary.TButton', font=('Segoe UI', 9))
-        style.configure('Success.TButton', font=('Segoe UI', 9))
-        style.configure('Danger.TButton', font=('Segoe UI', 9))
+        style.configure('Title.TLabel', font=self.fonts['title'], background=self.colors['bg'])
+        style.configure('Subtitle.TLabel', font=self.fonts['body'], foreground=self.colors['text_light'], background=self.colors['bg'])
+        style.configure('Primary.TButton', font=self.fonts['small'])
+        style.configure('Success.TButton', font=self.fonts['small'])
+        style.configure('Danger.TButton', font=self.fonts['small'])
         
     def setup_gui(self):
         """Setup the main GUI structure"""
@@ -84,7 +293,7 @@ class ModernTelegramBotGUI:
         
         # Logo/Title
         title_label = ttk.Label(sidebar_frame, text="Telegram Bot", 
-                               font=('Segoe UI', 14, 'bold'),
+                               font=self.fonts['brand'],
                                background=self.colors['sidebar'])
         title_label.pack(pady=(20, 30))
         
@@ -102,7 +311,7 @@ class ModernTelegramBotGUI:
         self.nav_buttons = {}
         for text, command in nav_buttons:
             btn = tk.Button(sidebar_frame, text=text, command=command,
-                           font=('Segoe UI', 10), relief='flat',
+                           font=self.fonts['body'], relief='flat',
                            bg=self.colors['sidebar'], fg=self.colors['text'],
                            anchor='w', padx=20, pady=10,
                            activebackground=self.colors['primary'],
@@ -121,20 +330,34 @@ class ModernTelegramBotGUI:
         self.status_frame.pack(side='bottom', fill='x')
         
         self.status_label = ttk.Label(self.status_frame, text="Ready", 
-                                     font=('Segoe UI', 9),
+                                     font=self.fonts['small'],
                                      foreground=self.colors['text_light'])
         self.status_label.pack(side='left', padx=10, pady=5)
         
         # Connection status
         self.connection_label = ttk.Label(self.status_frame, text="●", 
-                                         font=('Segoe UI', 12),
+                                         font=self.fonts['indicator'],
                                          foreground=self.colors['danger'])
         self.connection_label.pack(side='right', padx=10, pady=5)
         
     def clear_content(self):
-        """Clear main content area"""
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        """Hide the current panel in the main content area"""
+        for panel in self._panels.values():
+            panel.pack_forget()
+    
+    def _show_panel(self, name, nav_text, build, refresh=None):
+        """Show a content panel, building it on first use and refreshing its data"""
+        self.clear_content()
+        self.update_nav_buttons(nav_text)
+        
+        panel = self._panels.get(name)
+        if panel is None:
+            panel = self._panels[name] = ttk.Frame(self.content_frame, style='Main.TFrame')
+            build(panel)
+        panel.pack(fill='both', expand=True)
+        
+        if refresh:
+            refresh()
             
     def update_nav_buttons(self, active_button):
         """Update navigation button styles"""
@@ -146,30 +369,30 @@ class ModernTelegramBotGUI:
                 
     def show_dashboard(self):
         """Show dashboard view"""
-        self.clear_content()
-        self.update_nav_buttons("🏠 Dashboard")
-        
+        self._show_panel("dashboard", "🏠 Dashboard", self._build_dashboard, self.refresh_dashboard)
+    
+    def _build_dashboard(self, parent):
+        """Build the dashboard panel widgets"""
         # Title
-        title = ttk.Label(self.content_frame, text="Dashboard", style='Title.TLabel')
+        title = ttk.Label(parent, text="Dashboard", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Stats cards
-        stats_frame = ttk.Frame(self.content_frame)
+        stats_frame = ttk.Frame(parent)
         stats_frame.pack(fill='x', pady=(0, 20))
         
-        # Get statistics
-        stats = self.get_dashboard_stats()
-        
-        # Create stat cards
+        # Create stat cards; values are filled in by refresh_dashboard
         card_configs = [
-            ("Total Messages", stats['total_messages'], self.colors['primary']),
-            ("Active Mappings", stats['active_mappings'], self.colors['success']),
-            ("Pending Messages", stats['pending_messages'], self.colors['warning']),
-            ("Posted Today", stats['posted_today'], self.colors['success'])
+            ("Total Messages", 'total_messages', self.colors['primary']),
+            ("Active Mappings", 'active_mappings', self.colors['success']),
+            ("Pending Messages", 'pending_messages', self.colors['warning']),
+            ("Posted Today", 'posted_today', self.colors['success'])
         ]
         
-        for i, (title, value, color) in enumerate(card_configs):
-            card = self.create_stat_card(stats_frame, title, str(value), color)
+        self._stat_vars = {}
+        for i, (title, key, color) in enumerate(card_configs):
+            self._stat_vars[key] = tk.StringVar(value="0")
+            card = self.create_stat_card(stats_frame, title, self._stat_vars[key], color)
             card.grid(row=0, column=i, padx=10, sticky='ew')
         
         # Configure grid weights
@@ -177,7 +400,7 @@ class ModernTelegramBotGUI:
             stats_frame.grid_columnconfigure(i, weight=1)
             
         # Recent activity
-        activity_frame = ttk.LabelFrame(self.content_frame, text="Recent Activity", padding=10)
+        activity_frame = ttk.LabelFrame(parent, text="Recent Activity", padding=10)
         activity_frame.pack(fill='both', expand=True, pady=(0, 10))
         
         self.activity_tree = ttk.Treeview(activity_frame, columns=('Time', 'Mapping', 'Status', 'Message'), show='headings', height=10)
@@ -199,21 +422,28 @@ class ModernTelegramBotGUI:
         
         self.activity_tree.pack(side='left', fill='both', expand=True)
         activity_scrollbar.pack(side='right', fill='y')
+    
+    def refresh_dashboard(self):
+        """Reload dashboard statistics and recent activity"""
+        stats = self.get_dashboard_stats()
+        for key, var in self._stat_vars.items():
+            text = f"{stats[key]:,}"
+            if var.get() != text:
+                var.set(text)
         
-        # Load recent activity
         self.load_recent_activity()
         
-    def create_stat_card(self, parent, title, value, color):
-        """Create a statistics card"""
+    def create_stat_card(self, parent, title, variable, color):
+        """Create a statistics card whose value label follows a StringVar"""
         card = ttk.Frame(parent, relief='solid', borderwidth=1)
         card.configure(style='Main.TFrame')
         
         # Value
-        value_label = ttk.Label(card, text=value, font=('Segoe UI', 24, 'bold'))
+        value_label = ttk.Label(card, textvariable=variable, font=self.fonts['stat_value'])
         value_label.pack(pady=(10, 0))
         
         # Title
-        title_label = ttk.Label(card, text=title, font=('Segoe UI', 10), 
+        title_label = ttk.Label(card, text=title, font=self.fonts['body'], 
                                foreground=self.colors['text_light'])
         title_label.pack(pady=(0, 10))
         
@@ -221,14 +451,15 @@ class ModernTelegramBotGUI:
         
     def show_configuration(self):
         """Show Telegram configuration"""
-        self.clear_content()
-        self.update_nav_buttons("⚙️ Configuration")
-        
-        title = ttk.Label(self.content_frame, text="Telegram Configuration", style='Title.TLabel')
+        self._show_panel("configuration", "⚙️ Configuration", self._build_configuration)
+    
+    def _build_configuration(self, parent):
+        """Build the configuration panel widgets"""
+        title = ttk.Label(parent, text="Telegram Configuration", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Configuration form
-        config_frame = ttk.LabelFrame(self.content_frame, text="Telegram Settings", padding=20)
+        config_frame = ttk.LabelFrame(parent, text="Telegram Settings", padding=20)
         config_frame.pack(fill='x', pady=(0, 10))
         
         # API ID
@@ -265,14 +496,15 @@ class ModernTelegramBotGUI:
         
     def show_ai_settings(self):
         """Show AI configuration"""
-        self.clear_content()
-        self.update_nav_buttons("🤖 AI Settings")
-        
-        title = ttk.Label(self.content_frame, text="AI Configuration", style='Title.TLabel')
+        self._show_panel("ai_settings", "🤖 AI Settings", self._build_ai_settings)
+    
+    def _build_ai_settings(self, parent):
+        """Build the ai settings panel widgets"""
+        title = ttk.Label(parent, text="AI Configuration", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # AI form
-        ai_frame = ttk.LabelFrame(self.content_frame, text="AI Settings", padding=20)
+        ai_frame = ttk.LabelFrame(parent, text="AI Settings", padding=20)
         ai_frame.pack(fill='x', pady=(0, 10))
         
         # Provider selection
@@ -317,14 +549,15 @@ class ModernTelegramBotGUI:
         
     def show_mappings(self):
         """Show channel mappings management"""
-        self.clear_content()
-        self.update_nav_buttons("🔄 Channel Mappings")
-        
-        title = ttk.Label(self.content_frame, text="Channel Mappings", style='Title.TLabel')
+        self._show_panel("mappings", "🔄 Channel Mappings", self._build_mappings, self.load_mappings)
+    
+    def _build_mappings(self, parent):
+        """Build the mappings panel widgets"""
+        title = ttk.Label(parent, text="Channel Mappings", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Toolbar
-        toolbar = ttk.Frame(self.content_frame)
+        toolbar = ttk.Frame(parent)
         toolbar.pack(fill='x', pady=(0, 10))
         
         add_btn = ttk.Button(toolbar, text="+ Add Mapping", command=self.add_mapping_dialog)
@@ -337,10 +570,10 @@ class ModernTelegramBotGUI:
         delete_btn.pack(side='left')
         
         # Mappings tree
-        mappings_frame = ttk.Frame(self.content_frame)
+        mappings_frame = ttk.Frame(parent)
         mappings_frame.pack(fill='both', expand=True)
         
-        self.mappings_tree = ttk.Treeview(mappings_frame, 
+        self.mappings_tree = LazyTreeview(mappings_frame, key_column=0,
                                          columns=('ID', 'Source', 'Target', 'Status', 'Keywords'), 
                                          show='headings')
         
@@ -366,18 +599,17 @@ class ModernTelegramBotGUI:
         v_scroll.pack(side='right', fill='y')
         h_scroll.pack(side='bottom', fill='x')
         
-        self.load_mappings()
-        
     def show_processing(self):
         """Show processing control panel"""
-        self.clear_content()
-        self.update_nav_buttons("▶️ Start Processing")
-        
-        title = ttk.Label(self.content_frame, text="Message Processing", style='Title.TLabel')
+        self._show_panel("processing", "▶️ Start Processing", self._build_processing)
+    
+    def _build_processing(self, parent):
+        """Build the processing panel widgets"""
+        title = ttk.Label(parent, text="Message Processing", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Processing options
-        options_frame = ttk.LabelFrame(self.content_frame, text="Processing Options", padding=20)
+        options_frame = ttk.LabelFrame(parent, text="Processing Options", padding=20)
         options_frame.pack(fill='x', pady=(0, 10))
         
         # Processing mode
@@ -409,7 +641,7 @@ class ModernTelegramBotGUI:
         media_check.pack(anchor='w')
         
         # Control buttons
-        control_frame = ttk.Frame(self.content_frame)
+        control_frame = ttk.Frame(parent)
         control_frame.pack(fill='x', pady=20)
         
         self.start_btn = ttk.Button(control_frame, text="▶️ Start Processing", 
@@ -422,7 +654,7 @@ class ModernTelegramBotGUI:
         self.stop_btn.pack(side='left')
         
         # Log area
-        log_frame = ttk.LabelFrame(self.content_frame, text="Processing Log", padding=10)
+        log_frame = ttk.LabelFrame(parent, text="Processing Log", padding=10)
         log_frame.pack(fill='both', expand=True)
         
         self.log_text = scrolledtext.ScrolledText(log_frame, height=15, wrap=tk.WORD)
@@ -430,22 +662,23 @@ class ModernTelegramBotGUI:
         
     def show_channels(self):
         """Show available channels"""
-        self.clear_content()
-        self.update_nav_buttons("📱 Channels")
-        
-        title = ttk.Label(self.content_frame, text="Available Channels", style='Title.TLabel')
+        self._show_panel("channels", "📱 Channels", self._build_channels, self.load_channels)
+    
+    def _build_channels(self, parent):
+        """Build the channels panel widgets"""
+        title = ttk.Label(parent, text="Available Channels", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Refresh button
-        refresh_btn = ttk.Button(self.content_frame, text="🔄 Refresh Channels", 
+        refresh_btn = ttk.Button(parent, text="🔄 Refresh Channels", 
                                 command=self.refresh_channels)
         refresh_btn.pack(anchor='w', pady=(0, 10))
         
         # Channels tree
-        channels_frame = ttk.Frame(self.content_frame)
+        channels_frame = ttk.Frame(parent)
         channels_frame.pack(fill='both', expand=True)
         
-        self.channels_tree = ttk.Treeview(channels_frame, 
+        self.channels_tree = LazyTreeview(channels_frame, key_column=1,
                                          columns=('Name', 'ID', 'Type'), 
                                          show='headings')
         
@@ -464,30 +697,24 @@ class ModernTelegramBotGUI:
         self.channels_tree.pack(side='left', fill='both', expand=True)
         channels_scroll.pack(side='right', fill='y')
         
-        self.load_channels()
-        
     def show_database(self):
         """Show database management"""
-        self.clear_content()
-        self.update_nav_buttons("📊 Database")
-        
-        title = ttk.Label(self.content_frame, text="Database Management", style='Title.TLabel')
+        self._show_panel("database", "📊 Database", self._build_database, self.refresh_database_stats)
+    
+    def _build_database(self, parent):
+        """Build the database panel widgets"""
+        title = ttk.Label(parent, text="Database Management", style='Title.TLabel')
         title.pack(anchor='w', pady=(0, 20))
         
         # Database stats
-        stats_frame = ttk.LabelFrame(self.content_frame, text="Statistics", padding=15)
+        stats_frame = ttk.LabelFrame(parent, text="Statistics", padding=15)
         stats_frame.pack(fill='x', pady=(0, 10))
         
-        stats = self.get_database_stats()
-        stats_text = f"""Total Messages: {stats['total_messages']}
-Posted Messages: {stats['posted_messages']}
-Pending Messages: {stats['pending_messages']}
-Stored Channels: {stats['channels']}"""
-        
-        ttk.Label(stats_frame, text=stats_text, font=('Consolas', 10)).pack(anchor='w')
+        self.db_stats_label = ttk.Label(stats_frame, font=self.fonts['mono'])
+        self.db_stats_label.pack(anchor='w')
         
         # Database actions
-        actions_frame = ttk.LabelFrame(self.content_frame, text="Actions", padding=15)
+        actions_frame = ttk.LabelFrame(parent, text="Actions", padding=15)
         actions_frame.pack(fill='x', pady=(0, 10))
         
         action_buttons = [
@@ -501,30 +728,31 @@ Stored Channels: {stats['channels']}"""
             btn = ttk.Button(actions_frame, text=text, command=command)
             btn.pack(side='left', padx=(0, 10))
             
+    def refresh_database_stats(self):
+        """Reload the database statistics panel"""
+        stats = self.get_database_stats()
+        self.db_stats_label.configure(text=f"""Total Messages: {stats['total_messages']}
+Posted Messages: {stats['posted_messages']}
+Pending Messages: {stats['pending_messages']}
+Stored Channels: {stats['channels']}""")
+    
     def get_dashboard_stats(self):
         """Get dashboard statistics"""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages")
-                total_messages = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages WHERE posted = 0")
-                pending_messages = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages WHERE posted = 1 AND date(date_posted) = date('now')")
-                posted_today = cursor.fetchone()[0]
-                
-                active_mappings = len(self.config_manager.get_active_mappings())
-                
-                return {
-                    'total_messages': total_messages,
-                    'pending_messages': pending_messages,
-                    'posted_today': posted_today,
-                    'active_mappings': active_mappings
-                }
+            # Reuses the database manager's long-lived connection and its warm page cache
+            # One pass over the table for all three counts
+            total_messages, pending_messages, posted_today = (
+                self.db_manager.connection().execute(_SQL_DASHBOARD_COUNTS).fetchone()
+            )
+            
+            active_mappings, _ = self.get_mapping_snapshot()
+            
+            return {
+                'total_messages': total_messages,
+                'pending_messages': pending_messages,
+                'posted_today': posted_today,
+                'active_mappings': active_mappings
+            }
         except Exception:
             return {
                 'total_messages': 0,
@@ -535,26 +763,30 @@ Stored Channels: {stats['channels']}"""
             
     def load_recent_activity(self):
         """Load recent activity into the tree"""
+        self.load_rows_in_background(self._prepare_activity_rows, self._apply_activity_rows)
+    
+    def _prepare_activity_rows(self):
+        """Query recent activity and build its tree rows (runs off the Tk thread)"""
+        rows = []
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT date_received, mapping_id, posted, original_message
-                    FROM processed_messages 
-                    ORDER BY date_received DESC 
-                    LIMIT 20
-                """)
+            cursor = self.db_manager.connection().execute(_SQL_RECENT_ACTIVITY)
+            
+            for row in cursor.fetchall():
+                # date_received comes back as a datetime from the TIMESTAMP converter
+                date_str = str(row[0])[:19] if row[0] else 'Unknown'
+                mapping_id = row[1]
+                status = 'Posted' if row[2] else 'Pending'
+                message_preview = row[3] or ''
                 
-                for row in cursor.fetchall():
-                    date_str = row[0][:19] if row[0] else 'Unknown'
-                    mapping_id = row[1]
-                    status = 'Posted' if row[2] else 'Pending'
-                    message_preview = (row[3][:50] + '...') if row[3] and len(row[3]) > 50 else (row[3] or '')
-                    
-                    self.activity_tree.insert('', 'end', values=(date_str, mapping_id, status, message_preview))
+                rows.append((date_str, mapping_id, status, message_preview))
         except Exception as e:
             print(f"Error loading activity: {e}")
+        return rows
+    
+    def _apply_activity_rows(self, rows):
+        self.activity_tree.delete(*self.activity_tree.get_children())
+        for values in rows:
+            self.activity_tree.insert('', 'end', values=values)
             
     def save_telegram_config(self):
         """Save Telegram configuration"""
@@ -563,6 +795,7 @@ Stored Channels: {stats['channels']}"""
             self.config_manager.telegram_config.api_hash = self.api_hash_var.get()
             self.config_manager.telegram_config.phone_number = self.phone_var.get()
             
+            self.bump_config_version()
             if self.config_manager.save_config():
                 messagebox.showinfo("Success", "Telegram configuration saved successfully!")
                 self.update_status("Telegram configuration saved")
@@ -579,6 +812,7 @@ Stored Channels: {stats['channels']}"""
             self.config_manager.ai_config.model = self.ai_model_var.get()
             self.config_manager.ai_config.base_url = self.base_url_var.get()
             
+            self.bump_config_version()
             if self.config_manager.save_config():
                 messagebox.showinfo("Success", "AI configuration saved successfully!")
                 self.update_status("AI configuration saved")
@@ -589,54 +823,63 @@ Stored Channels: {stats['channels']}"""
             
     def test_telegram_connection(self):
         """Test Telegram connection"""
-        def test_connection():
-            try:
-                self.update_status("Testing Telegram connection...")
-                # Implementation would go here
-                # For now, just simulate success
-                self.root.after(2000, lambda: messagebox.showinfo("Success", "Telegram connection successful!"))
-                self.root.after(2000, lambda: self.update_connection_status(True))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Connection failed: {e}"))
-                self.root.after(0, lambda: self.update_connection_status(False))
-        
-        threading.Thread(target=test_connection, daemon=True).start()
+        self.run_async(self._test_telegram_connection())
+    
+    async def _test_telegram_connection(self):
+        try:
+            self.call_in_tk(self.update_status, "Testing Telegram connection...")
+            # Implementation would go here
+            # For now, just simulate success
+            await asyncio.sleep(2)
+            self.root.after(0, lambda: messagebox.showinfo("Success", "Telegram connection successful!"))
+            self.call_in_tk(self.update_connection_status, True)
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Connection failed: {e}"))
+            self.call_in_tk(self.update_connection_status, False)
         
     def test_ai_connection(self):
         """Test AI connection"""
-        def test_ai():
-            try:
-                self.update_status("Testing AI connection...")
-                # Implementation would go here
-                self.root.after(2000, lambda: messagebox.showinfo("Success", "AI connection successful!"))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"AI connection failed: {e}"))
-        
-        threading.Thread(target=test_ai, daemon=True).start()
+        self.run_async(self._test_ai_connection())
+    
+    async def _test_ai_connection(self):
+        try:
+            self.call_in_tk(self.update_status, "Testing AI connection...")
+            # Implementation would go here
+            await asyncio.sleep(2)
+            self.root.after(0, lambda: messagebox.showinfo("Success", "AI connection successful!"))
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"AI connection failed: {e}"))
         
+    def bump_config_version(self):
+        """Mark cached mapping data as stale after the configuration changes"""
+        self._config_version += 1
+    
+    def get_mapping_snapshot(self):
+        """Return (active mapping count, mapping tree rows), cached per config version"""
+        if self._mapping_cache is None or self._mapping_cache[0] != self._config_version:
+            rows = tuple(
+                (
+                    mapping_id,
+                    mapping.source_channel_name,
+                    mapping.target_channel_name,
+                    "Active" if mapping.active else "Inactive",
+                    mapping.keywords_display
+                )
+                for mapping_id, mapping in self.config_manager.channel_mappings.items()
+            )
+            active_count = len(self.config_manager.get_active_mappings())
+            self._mapping_cache = (self._config_version, active_count, rows)
+        return self._mapping_cache[1], self._mapping_cache[2]
+    
     def load_mappings(self):
         """Load channel mappings into tree"""
-        # Clear existing items
-        for item in self.mappings_tree.get_children():
-            self.mappings_tree.delete(item)
-            
-        # Load mappings
-        for mapping_id, mapping in self.config_manager.channel_mappings.items():
-            status = "Active" if mapping.active else "Inactive"
-            keywords = ", ".join(mapping.keywords) if mapping.keywords else "None"
-            
-            self.mappings_tree.insert('', 'end', values=(
-                mapping_id,
-                mapping.source_channel_name,
-                mapping.target_channel_name,
-                status,
-                keywords
-            ))
+        self.load_rows_in_background(lambda: self.get_mapping_snapshot()[1], self.mappings_tree.set_rows)
     
     def add_mapping_dialog(self):
         """Show add mapping dialog"""
         dialog = MappingDialog(self.root, self.config_manager, title="Add New Mapping")
         if dialog.result:
+            self.bump_config_version()
             self.load_mappings()
             self.update_status("Mapping added successfully")
     
@@ -653,6 +896,7 @@ Stored Channels: {stats['channels']}"""
         dialog = MappingDialog(self.root, self.config_manager, 
                               title="Edit Mapping", mapping_id=mapping_id)
         if dialog.result:
+            self.bump_config_version()
             self.load_mappings()
             self.update_status("Mapping updated successfully")
     
@@ -668,6 +912,7 @@ Stored Channels: {stats['channels']}"""
         
         if messagebox.askyesno("Confirm Delete", f"Delete mapping '{mapping_id}'?"):
             if self.config_manager.remove_channel_mapping(mapping_id):
+                self.bump_config_version()
                 self.load_mappings()
                 self.update_status("Mapping deleted successfully")
             else:
@@ -678,110 +923,116 @@ Stored Channels: {stats['channels']}"""
         if self.is_monitoring:
             return
             
-        def start_async():
-            try:
-                self.is_monitoring = True
-                self.root.after(0, lambda: self.start_btn.configure(state='disabled'))
-                self.root.after(0, lambda: self.stop_btn.configure(state='normal'))
-                
-                # Initialize processor if needed
-                if not self.processor:
-                    self.processor = MultiChannelProcessor(self.config_manager)
-                    
-                # Configure processing options
-                session_config = {
-                    'use_ai_agent': self.use_ai.get(),
-                    'include_media': self.include_media.get(),
-                    'processing_mode': self.processing_mode.get()
-                }
-                
-                self.processor.session_config = session_config
+        self.is_monitoring = True
+        self.start_btn.configure(state='disabled')
+        self.stop_btn.configure(state='normal')
+        
+        # Tk variables are read here, on the Tk thread, before handing off to the loop
+        session_config = {
+            'use_ai_agent': self.use_ai.get(),
+            'include_media': self.include_media.get(),
+            'processing_mode': self.processing_mode.get()
+        }
+        # A fresh event per run, so a restart can't revive a loop that is still stopping
+        self._stop_evt = asyncio.Event()
+        self.monitoring_task = self.run_async(self._monitor_messages(session_config, self._stop_evt))
+    
+    async def _monitor_messages(self, session_config, stop_evt):
+        try:
+            # Initialize processor if needed
+            if not self.processor:
+                self.processor = MultiChannelProcessor(self.config_manager)
                 
-                self.root.after(0, lambda: self.log_message("Starting message processing..."))
-                self.root.after(0, lambda: self.update_status("Processing active"))
+            # Configure processing options
+            self.processor.session_config = session_config
+            
+            self.call_in_tk(self.log_message, "Starting message processing...")
+            self.call_in_tk(self.update_status, "Processing active")
+            
+            # Simulate processing (replace with actual implementation)
+            while not stop_evt.is_set():
+                self.call_in_tk(self.log_message, "Checking for new messages...")
+                # Wakes at once on stop instead of finishing the 5 s interval
+                try:
+                    await asyncio.wait_for(stop_evt.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
                 
-                # Simulate processing (replace with actual implementation)
-                import time
-                while self.is_monitoring:
-                    self.root.after(0, lambda: self.log_message("Checking for new messages..."))
-                    time.sleep(5)
-                    
-            except Exception as e:
-                self.root.after(0, lambda: self.log_message(f"Error: {e}"))
-                self.root.after(0, lambda: self.stop_processing())
-        
-        self.monitoring_thread = threading.Thread(target=start_async, daemon=True)
-        self.monitoring_thread.start()
+        except Exception as e:
+            self.call_in_tk(self.log_message, f"Error: {e}")
+            self.root.after(0, lambda: self.stop_processing())
     
     def stop_processing(self):
         """Stop message processing"""
         self.is_monitoring = False
+        self.loop.call_soon_threadsafe(self._stop_evt.set)
+        self.monitoring_task = None
         self.start_btn.configure(state='normal')
         self.stop_btn.configure(state='disabled')
         self.log_message("Processing stopped")
         self.update_status("Ready")
     
     def log_message(self, message):
-        """Add message to log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
+        """Add message to log (buffered, written on the next log flush)"""
+        timestamp = time.strftime(_TS_FMT)
+        self._log_pending.append(f"[{timestamp}] {message}\n")
+        if not self._log_scheduled:
+            self._log_scheduled = True
+            self.root.after(LOG_FLUSH_MS, self._flush_log)
+    
+    def _flush_log(self):
+        """Write all buffered log lines with a single insert"""
+        self._log_scheduled = False
+        entries, self._log_pending = self._log_pending, []
+        if entries:
+            self.log_text.insert(tk.END, "".join(entries))
+            self.log_text.see(tk.END)
     
     def refresh_channels(self):
         """Refresh channels list"""
-        def refresh_async():
-            try:
-                self.root.after(0, lambda: self.update_status("Refreshing channels..."))
-                # Implementation would fetch actual channels
-                # For now, just show success
-                self.root.after(2000, lambda: self.load_channels())
-                self.root.after(2000, lambda: self.update_status("Channels refreshed"))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to refresh channels: {e}"))
-        
-        threading.Thread(target=refresh_async, daemon=True).start()
+        self.run_async(self._refresh_channels())
+    
+    async def _refresh_channels(self):
+        try:
+            self.call_in_tk(self.update_status, "Refreshing channels...")
+            # Implementation would fetch actual channels
+            # For now, just show success
+            await asyncio.sleep(2)
+            self.root.after(0, lambda: self.load_channels())
+            self.call_in_tk(self.update_status, "Channels refreshed")
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to refresh channels: {e}"))
     
     def load_channels(self):
         """Load channels into tree"""
-        # Clear existing items
-        for item in self.channels_tree.get_children():
-            self.channels_tree.delete(item)
-            
-        # Load from database
-        channels = self.db_manager.get_all_channels()
-        for channel in channels:
-            self.channels_tree.insert('', 'end', values=(
-                channel['name'],
-                channel['id'],
-                channel['type']
-            ))
+        self.load_rows_in_background(self._prepare_channel_rows, self.channels_tree.set_rows)
+    
+    def _prepare_channel_rows(self):
+        """Build channel tree rows from the database (runs off the Tk thread)"""
+        return [
+            (channel['name'], channel['id'], channel['type'])
+            for channel in self.db_manager.iter_channels()
+        ]
     
     def get_database_stats(self):
-        """Get database statistics"""
+        """Get database statistics, cached until the database is next written"""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages")
-                total_messages = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages WHERE posted = 1")
-                posted_messages = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM processed_messages WHERE posted = 0")
-                pending_messages = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM channels")
-                channels = cursor.fetchone()[0]
-                
-                return {
-                    'total_messages': total_messages,
-                    'posted_messages': posted_messages,
-                    'pending_messages': pending_messages,
-                    'channels': channels
-                }
+            version = self.db_manager.data_version()
+            if self._db_stats_cache is not None and self._db_stats_cache[0] == version:
+                return self._db_stats_cache[1]
+            
+            total_messages, posted_messages, pending_messages, channels = (
+                self.db_manager.connection().execute(_SQL_DATABASE_COUNTS).fetchone()
+            )
+            
+            stats = {
+                'total_messages': total_messages,
+                'posted_messages': posted_messages,
+                'pending_messages': pending_messages,
+                'channels': channels
+            }
+            self._db_stats_cache = (version, stats)
+            return stats
         except Exception:
             return {
                 'total_messages': 0,
@@ -801,44 +1052,56 @@ Stored Channels: {stats['channels']}"""
             filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
         )
         if filename:
-            try:
-                # Implementation would export actual data
-                messagebox.showinfo("Success", f"Database exported to {filename}")
-                self.update_status("Database exported")
-            except Exception as e:
-                messagebox.showerror("Error", f"Export failed: {e}")
+            self.update_status("Exporting database...")
+            self.run_async(self._export_database(filename))
+    
+    async def _export_database(self, filename):
+        def progress(count):
+            self.call_in_tk(self.update_status, f"Exporting database... {count:,} messages")
+        
+        try:
+            count = await asyncio.to_thread(self.db_manager.export_messages, filename, progress)
+            if count is None:
+                self.root.after(0, lambda: messagebox.showerror("Error", "Export failed"))
+                return
+            self.root.after(0, lambda: messagebox.showinfo("Success", f"Exported {count} messages to {filename}"))
+            self.call_in_tk(self.update_status, "Database exported")
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Export failed: {e}"))
     
     def clear_posted_messages(self):
         """Clear posted messages"""
         if messagebox.askyesno("Confirm", "Delete all posted messages from database?"):
-            try:
-                import sqlite3
-                with sqlite3.connect(self.db_manager.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM processed_messages WHERE posted = 1")
-                    deleted = cursor.rowcount
-                    conn.commit()
-                
+            deleted = self.db_manager.delete_posted_messages()
+            if deleted is not None:
                 messagebox.showinfo("Success", f"Deleted {deleted} posted messages")
                 self.update_status("Posted messages cleared")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to clear messages: {e}")
+            else:
+                messagebox.showerror("Error", "Failed to clear messages")
     
     def vacuum_database(self):
         """Vacuum database"""
-        try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                conn.execute("VACUUM")
-            
-            messagebox.showinfo("Success", "Database optimized successfully")
-            self.update_status("Database optimized")
-        except Exception as e:
-            messagebox.showerror("Error", f"Optimization failed: {e}")
+        self.update_status("Optimizing database...")
+        self.run_async(self._vacuum_database())
+    
+    async def _vacuum_database(self):
+        # Vacuuming holds the write lock; run it in a worker so neither Tk nor the loop stalls
+        if await asyncio.to_thread(self.db_manager.vacuum):
+            self.root.after(0, lambda: messagebox.showinfo("Success", "Database optimized successfully"))
+            self.call_in_tk(self.update_status, "Database optimized")
+        else:
+            self.root.after(0, lambda: messagebox.showerror("Error", "Optimization failed"))
     
     def update_status(self, message):
-        """Update status bar"""
-        self.status_label.configure(text=message)
+        """Update status bar; rapid updates are coalesced and only the latest is shown"""
+        self._status_pending = message
+        if not self._status_scheduled:
+            self._status_scheduled = True
+            self.root.after(STATUS_FLUSH_MS, self._flush_status)
+    
+    def _flush_status(self):
+        self._status_scheduled = False
+        self.status_label.configure(text=self._status_pending)
     
     def update_connection_status(self, connected):
         """Update connection indicator"""
@@ -849,14 +1112,13 @@ Stored Channels: {stats['channels']}"""
     
     def load_initial_data(self):
         """Load initial data"""
+        self.run_async(self._load_initial_data())
+    
+    async def _load_initial_data(self):
         # Check if configurations are complete
         tg_config = self.config_manager.telegram_config
-        ai_config = self.config_manager.ai_config
-        
-        if all([tg_config.api_id, tg_config.api_hash, tg_config.phone_number]):
-            self.update_connection_status(True)
-        else:
-            self.update_connection_status(False)
+        configured = bool(tg_config.api_id and tg_config.api_hash and tg_config.phone_number)
+        self.call_in_tk(self.update_connection_status, configured)
     
     def run(self):
         """Start the GUI application"""
@@ -871,6 +1133,7 @@ Stored Channels: {stats['channels']}"""
         if self.processor:
             # Cleanup processor if needed
             pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
 
 class MappingDialog:
@@ -895,8 +1158,9 @@ class MappingDialog:
         self.setup_dialog()
         
         # Load existing mapping data if editing
-        if mapping_id and mapping_id in config_manager.channel_mappings:
-            self.load_mapping_data(config_manager.channel_mappings[mapping_id])
+        existing = config_manager.channel_mappings.get(mapping_id) if mapping_id else None
+        if existing:
+            self.load_mapping_data(existing)
     
     def setup_dialog(self):
         """Setup dialog UI"""
@@ -989,7 +1253,7 @@ class MappingDialog:
                 source_channel_name=self.source_name_var.get().strip(),
                 target_channel_id=int(self.target_id_var.get().strip()),
                 target_channel_name=self.target_name_var.get().strip(),
-                keywords=[k.strip() for k in self.keywords_var.get().split(",") if k.strip()],
+                keywords=parse_keywords(self.keywords_var.get()),
                 signature=self.signature_var.get().strip(),
                 active=self.active_var.get()
             )
@@ -1012,6 +1276,8 @@ class UnpostedMessagesDialog:
     
     def __init__(self, parent, db_manager):
         self.db_manager = db_manager
+        self._last_key = None  # (date_received, id) of the last loaded row
+        self._row_meta = {}  # Tree item id -> (db_id, msg_id, mapping_id)
         
         # Create dialog window
         self.dialog = tk.Toplevel(parent)
@@ -1060,75 +1326,78 @@ class UnpostedMessagesDialog:
                                command=self.delete_message)
         delete_btn.pack(side='left', padx=(0, 10))
         
+        self.load_more_btn = ttk.Button(button_frame, text="Load More", 
+                                       command=self.load_unposted_messages)
+        self.load_more_btn.pack(side='left', padx=(0, 10))
+        
         close_btn = ttk.Button(button_frame, text="Close", 
                               command=self.dialog.destroy)
         close_btn.pack(side='right')
     
     def load_unposted_messages(self):
-        """Load unposted messages"""
+        """Load the next page of unposted messages"""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT id, mapping_id, message_id, original_message, date_received
-                    FROM processed_messages WHERE posted = 0
-                    ORDER BY date_received DESC
-                """)
+            conn = self.db_manager.connection()
+            if self._last_key is None:
+                rows = conn.execute(_SQL_UNPOSTED_FIRST_PAGE, (UNPOSTED_PAGE_SIZE,)).fetchall()
+            else:
+                rows = conn.execute(_SQL_UNPOSTED_NEXT_PAGE, (*self._last_key, UNPOSTED_PAGE_SIZE)).fetchall()
+            
+            for row in rows:
+                db_id, mapping_id, msg_id, message_preview, date = row
+                date_str = str(date)[:19] if date else 'Unknown'
                 
-                for row in cursor.fetchall():
-                    db_id, mapping_id, msg_id, message, date = row
-                    message_preview = (message[:80] + '...') if len(message) > 80 else message
-                    date_str = date[:19] if date else 'Unknown'
-                    
-                    item = self.tree.insert('', 'end', values=(mapping_id, date_str, message_preview))
-                    # Store db_id and msg_id for later use
-                    self.tree.set(item, 'db_id', db_id)
-                    self.tree.set(item, 'msg_id', msg_id)
+                item = self.tree.insert('', 'end', values=(mapping_id, date_str, message_preview))
+                # Ids the actions need are kept Python-side rather than in the tree
+                self._row_meta[item] = (db_id, msg_id, mapping_id)
+            
+            if rows:
+                self._last_key = (rows[-1][4], rows[-1][0])
+            if len(rows) < UNPOSTED_PAGE_SIZE:
+                self.load_more_btn.configure(state='disabled')
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load messages: {e}")
     
+    def _forget_rows(self, items):
+        """Remove rows from the tree along with their stored ids"""
+        self.tree.delete(*items)
+        for item in items:
+            del self._row_meta[item]
+    
     def mark_as_posted(self):
-        """Mark selected message as posted"""
+        """Mark selected messages as posted"""
         selection = self.tree.selection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a message")
             return
         
         try:
-            item = selection[0]
-            db_id = self.tree.set(item, 'db_id')
-            msg_id = self.tree.set(item, 'msg_id')
-            mapping_id = self.tree.item(item)['values'][0]
+            pairs = [self._row_meta[item][1:] for item in selection]
             
-            if self.db_manager.mark_as_posted(int(msg_id), mapping_id):
-                self.tree.delete(item)
-                messagebox.showinfo("Success", "Message marked as posted")
+            if self.db_manager.mark_many_as_posted(pairs):
+                self._forget_rows(selection)
+                messagebox.showinfo("Success", f"{len(pairs)} message(s) marked as posted")
             else:
                 messagebox.showerror("Error", "Failed to mark as posted")
         except Exception as e:
             messagebox.showerror("Error", f"Error: {e}")
     
     def delete_message(self):
-        """Delete selected message"""
+        """Delete selected messages"""
         selection = self.tree.selection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a message")
             return
         
-        if messagebox.askyesno("Confirm", "Delete selected message?"):
+        if messagebox.askyesno("Confirm", f"Delete {len(selection)} selected message(s)?"):
             try:
-                item = selection[0]
-                db_id = self.tree.set(item, 'db_id')
-                
-                import sqlite3
-                with sqlite3.connect(self.db_manager.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM processed_messages WHERE id = ?", (db_id,))
-                    conn.commit()
+                db_ids = [self._row_meta[item][0] for item in selection]
                 
-                self.tree.delete(item)
-                messagebox.showinfo("Success", "Message deleted")
+                if self.db_manager.delete_messages(db_ids):
+                    self._forget_rows(selection)
+                    messagebox.showinfo("Success", f"{len(db_ids)} message(s) deleted")
+                else:
+                    messagebox.showerror("Error", "Failed to delete message")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete: {e}")
 
@@ -1,8 +1,14 @@
 import asyncio
-from menu import MenuSystem
 import os
 import sys
 
+try:
+    import uvloop  # Optional: faster event loop (not available on Windows)
+except ImportError:
+    uvloop = None
+
+from dependencies import find_missing_packages
+
 
 async def main():
 
@@ -17,25 +23,22 @@ async def main():
                 pass"""
             
     """ Main entry point of the application """
+    # Imported here so the dependency check runs before telethon and friends load
+    from menu import MenuSystem
+    
     menu = MenuSystem()
     await menu.run()
 
 
 if __name__ == "__main__":
     
-    required_packages = [
-        "telethon",
-        "google_generativeai",
-        "asynico",
-        "sqlite3"
-    ]    
-
-    try:
-        import telethon
-        import google.generativeai
-        print("starting telegram multi-channel processor...\n")
-
+    missing = find_missing_packages()
+    if missing:
+        print(f"missing required packages: {', '.join(missing)}")
+        sys.exit(1)
+    
+    print("starting telegram multi-channel processor...\n")
+    if uvloop:
+        uvloop.run(main())
+    else:
         asyncio.run(main())
-
-    except ImportError as e :
-        print(f"missing required package: {e}")
\ No newline at end of file
@@ -1,13 +1,65 @@
 import asyncio
+import functools
 import logging
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 from config import ConfigManager, ChannelMapping
 from database import DatabaseManager, ProcessedMessage
 from ai_processor import UniversalMessageProcessor
 from telegram_client import TelegramChannelClient
 
+logger = logging.getLogger(__name__)
+
+# Rows written per transaction when backfilling historical messages
+SAVE_BATCH_SIZE = 500
+
+# Threads running blocking DatabaseManager calls for the event loop
+DB_THREADS = 4
+
+# Seconds between polling sweeps; new messages normally arrive via the event handler
+SWEEP_INTERVAL = 60
+
+
+class _MatchCriteria(NamedTuple):
+    """A mapping's signature and keywords, case-folded once for matching."""
+    fingerprint: Tuple[str, Tuple[str, ...]]  # Raw (signature, keywords) the rest was built from
+    signature: str
+    keywords: Tuple[str, ...]
+
+
+@functools.lru_cache(maxsize=64)
+def _keyword_automaton(signature: str, keywords: Tuple[str, ...]):
+    """Compile case-folded criteria into an Aho-Corasick automaton (needs pyahocorasick)."""
+    automaton = ahocorasick.Automaton()
+    for word in {w for w in (signature, *keywords) if w}:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+@functools.lru_cache(maxsize=1024)
+def _matches_cached(message_text: str, signature: str, keywords: Tuple[str, ...]) -> bool:
+    """Pure match of a message against case-folded criteria, memoized for repeated texts."""
+    message_folded = message_text.casefold()
+    if ahocorasick is not None:
+        # One linear scan finds every signature/keyword occurrence at once
+        automaton = _keyword_automaton(signature, keywords)
+        contains = {word for _, word in automaton.iter(message_folded)}.__contains__
+    else:
+        contains = message_folded.__contains__
+    
+    if signature and not contains(signature):
+        return False
+    # Stops at the first keyword found
+    return not keywords or any(contains(keyword) for keyword in keywords)
+
 
 class MultiChannelProcessor:
     """Main processor that handles multiple channel mappings."""
@@ -28,252 +80,288 @@ class MultiChannelProcessor:
             ai_config.api_key, 
             ai_config.model, 
             ai_config.provider, 
-            ai_config.base_url
+            ai_config.base_url,
+            ai_config.min_ai_length
         )
         
         self.is_running = False
+        # Set by stop_monitoring (possibly from another thread) to cut the sweep wait short
+        self._stop_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session_config = None
+        # DatabaseManager is synchronous; its calls run here so they never block the loop
+        self._db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+        # Serializes passes over the same mapping so its messages post in order
+        self._mapping_locks: Dict[str, asyncio.Lock] = {}
+        # mapping id -> highest source message id the event handler has looked at
+        self._examined: Dict[str, int] = {}
+        # source channel id -> active mappings reading from it, for the event handler
+        self._mappings_by_source: Dict[int, Tuple[ChannelMapping, ...]] = {}
+        # Caps in-flight AI requests across all mappings
+        self._ai_sem = asyncio.Semaphore(max(1, ai_config.max_concurrent_requests))
+        # mapping id -> prepared match criteria, rebuilt when the mapping's criteria change
+        self._criteria: Dict[str, _MatchCriteria] = {}
+
+    @property
+    def session_config(self) -> Optional[Dict[str, Any]]:
+        """Per-run options chosen by the user (AI, footer, media); None when unset."""
+        return self._session_config
     
+    @session_config.setter
+    def session_config(self, cfg: Optional[Dict[str, Any]]) -> None:
+        self._session_config = cfg
+        # Resolved once per run instead of on every message
+        self._custom_footer = (cfg.get('custom_footer') or None) if cfg else None
+        self._prompt_override = (cfg.get('ai_system_prompt') or None) if cfg else None
+
+    def _db(self, fn, *args):
+        """Run a blocking DatabaseManager call on the DB threads; returns an awaitable."""
+        return asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
     async def initialize(self) -> bool:
         """Initialize all components."""
         return await self.telegram_client.initialize()
     
-    async def process_historical_messages(self, mapping_id: str) -> None:
-        """Process historical messages for a specific mapping."""
+    async def process_historical_messages(self, mapping_id: str, since_date: Optional[datetime] = None) -> None:
+        """Process historical messages for a specific mapping.
+        
+        `since_date` defaults to seven days ago; a sweep over several mappings passes
+        one shared value so they all use the same floor.
+        """
         mapping = self.config_manager.channel_mappings.get(mapping_id)
         if not mapping:
-            logging.error(f"Mapping {mapping_id} not found")
+            logger.error("Mapping %s not found", mapping_id)
             return
         
-        since_date = datetime.now() - timedelta(days=7)
+        if since_date is None:
+            since_date = datetime.now(timezone.utc) - timedelta(days=7)
+        # Telegram filters out already-processed ids server-side
+        last_id = await self._db(self.db_manager.get_last_message_id, mapping.source_channel_id, mapping.id)
         messages = await self.telegram_client.get_channel_messages(
-            mapping.source_channel_id, since_date=since_date
+            mapping.source_channel_id, since_date=since_date, last_message_id=last_id
         )
         
+        # Backfills can be large, so rows are collected and written in batched transactions
         processed_count = 0
+        pending: List[ProcessedMessage] = []
         for msg_data in messages:
             if self._message_matches_criteria(msg_data['text'], mapping):
-                await self._process_single_message(msg_data, mapping)
+                await self._process_single_message(msg_data, mapping, pending)
                 processed_count += 1
+                if len(pending) >= SAVE_BATCH_SIZE:
+                    await self._db(self.db_manager.save_processed_messages_batch, pending)
+                    pending.clear()
+        if pending:
+            await self._db(self.db_manager.save_processed_messages_batch, pending)
         
-        print(f"  Processed {processed_count} messages for {mapping_id}")
+        logger.info("Processed %d messages for %s", processed_count, mapping_id)
     
     async def process_all_historical_messages(self) -> None:
         """Process historical messages for all active mappings."""
+        since_date = datetime.now(timezone.utc) - timedelta(days=7)
         for mapping_id in self.config_manager.channel_mappings:
             mapping = self.config_manager.channel_mappings[mapping_id]
             if mapping.active:
-                await self.process_historical_messages(mapping_id)
+                await self.process_historical_messages(mapping_id, since_date)
     
     def _message_matches_criteria(self, message_text: str, mapping: ChannelMapping) -> bool:
         """Check if message matches the mapping criteria."""
         if not message_text:
-            print(f"      ❌ Empty message text")
+            logger.debug("Empty message text")
             return False
         
-        print(f"      Checking criteria for: '{message_text[:30]}...'")
-        print(f"      Required signature: '{mapping.signature}'")
-        print(f"      Required keywords: {mapping.keywords}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Checking criteria for %r: signature=%r keywords=%r",
+                         message_text[:30], mapping.signature, mapping.keywords)
         
         # If no signature and no keywords are set, accept all messages
         if not mapping.signature and not mapping.keywords:
-            print(f"      ✅ No criteria set - accepting all messages")
+            logger.debug("No criteria set - accepting all messages")
             return True
         
-        message_lower = message_text.lower()
-        
-        # Check for signature (if set)
-        signature_match = True
-        if mapping.signature:
-            signature_match = mapping.signature.lower() in message_lower
-            print(f"      Signature match: {signature_match}")
-        
-        # Check for keywords (if set)
-        keyword_match = True
-        if mapping.keywords:
-            keyword_matches = [keyword.lower() in message_lower for keyword in mapping.keywords]
-            keyword_match = any(keyword_matches)
-            print(f"      Keyword matches: {keyword_matches} -> {keyword_match}")
-        
-        result = signature_match and keyword_match
-        print(f"      Final result: {result}")
+        # Identical texts (resends, edits, shared keyword sets) hit the cache
+        criteria = self._get_criteria(mapping)
+        result = _matches_cached(message_text, criteria.signature, criteria.keywords)
+        logger.debug("Final result: %s", result)
         return result
     
-    async def _process_single_message(self, msg_data: Dict[str, Any], mapping: ChannelMapping) -> None:
-            """Process a single message with smart AI processing based on content length and media."""
-            try:
-                # Check if already processed
-                last_id = self.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
-                if last_id and msg_data['id'] <= last_id:
-                    return
-                
-                # Get session config
-                prompt_to_use = mapping.prompt_template
-                custom_footer = None
-                
-                # Determine if AI processing is needed
-                should_use_ai = False
-                text_length = len(msg_data['text']) if msg_data['text'] else 0
-                
-                if hasattr(self, 'session_config'):
-                    custom_footer = self.session_config['custom_footer']
-                    
-                    # Always process captions (messages with media)
-                    if msg_data.get('has_media', False):
-                        should_use_ai = True  # Always process captions
-                    elif self.session_config.get('apply_ai_to_all', False):
-                        # Only apply AI to non-caption messages if user requested it
-                        should_use_ai = True
-                    
-                    if should_use_ai and self.session_config['ai_system_prompt']:
-                        prompt_to_use = self.session_config['ai_system_prompt']
-
-                # Process text
-                if should_use_ai:
-                    print(f"    🤖 Processing with AI (length: {text_length})")
-                    processed_text = await self.ai_processor.process_message(
-                        msg_data['text'], 
-                        prompt_to_use,
-                        custom_footer
-                    )
-                    if not processed_text:
-                        # Fallback to original if AI fails
-                        processed_text = msg_data['text']
-                        if custom_footer:
-                            processed_text += custom_footer
-                else:
-                    print(f"    📝 Using original text (length: {text_length})")
-                    processed_text = msg_data['text']
-                    if hasattr(self, 'session_config') and self.session_config.get('custom_footer'):
-                        processed_text += self.session_config['custom_footer']
+    def _get_criteria(self, mapping: ChannelMapping) -> _MatchCriteria:
+        """Return the mapping's prepared criteria, rebuilding them only when they change."""
+        fingerprint = (mapping.signature, tuple(mapping.keywords))
+        cached = self._criteria.get(mapping.id)
+        if cached and cached.fingerprint == fingerprint:
+            return cached
         
-                if processed_text:
-                    # Handle media download if enabled and present
-                    media_path = None
-                    if (hasattr(self, 'session_config') and 
-                        self.session_config.get('include_media') and 
-                        msg_data.get('has_media')):
-                        
-                        print(f"    🎬 Downloading media for message {msg_data['id']}")
-                        media_path = await self.telegram_client.download_media(
-                            msg_data['id'], 
-                            mapping.source_channel_id, 
-                            msg_data.get('media_file_id')
-                        )
-                        if media_path:
-                            print(f"    ✅ Media downloaded to: {media_path}")
-                        else:
-                            print(f"    ❌ Failed to download media")
-
-                    # Save to database with media info
-                    message = ProcessedMessage(
-                        message_id=msg_data['id'],
-                        source_channel_id=mapping.source_channel_id,
-                        target_channel_id=mapping.target_channel_id,
-                        mapping_id=mapping.id,
-                        original_message=msg_data['text'],
-                        processed_message=processed_text,
-                        date=msg_data['date'],
-                        has_media=msg_data.get('has_media', False),
-                        media_type=msg_data.get('media_type'),
-                        media_path=media_path,
-                        media_file_id=msg_data.get('media_file_id')
-                    )
-                    
-                    if self.db_manager.save_processed_message(message):
-                        action = "AI-processed" if should_use_ai else "Original"
-                        logging.info(f"{action} and saved message {msg_data['id']} for mapping {mapping.id}")
-                    else:
-                        logging.error(f"Failed to save message {msg_data['id']} for mapping {mapping.id}")
+        signature = mapping.signature.casefold() if mapping.signature else ""
+        keywords = tuple(keyword.casefold() for keyword in mapping.keywords)
+        criteria = self._criteria[mapping.id] = _MatchCriteria(fingerprint, signature, keywords)
+        return criteria
+    
+    async def _process_single_message(self, msg_data: Dict[str, Any], mapping: ChannelMapping,
+                                      pending: Optional[List[ProcessedMessage]] = None) -> Optional[ProcessedMessage]:
+            """Process a single message with smart AI processing based on content length and media.
+            
+            When `pending` is given the result is appended to it for a later batch save.
+            Callers fetch only messages newer than the mapping's last id, so none are re-checked here.
+            Returns the stored message, or None if it failed.
+            """
+            try:
+                processed_text = await self._ai_rewrite(msg_data, mapping)
+                return await self._persist_message(msg_data, mapping, processed_text, pending)
                 
             except Exception as e:
-                logging.error(f"Error processing message {msg_data['id']} for mapping {mapping.id}: {e}")
+                logger.error("Error processing message %s for mapping %s: %s", msg_data['id'], mapping.id, e)
+                return None
 
-    async def _process_single_message_with_config(self, msg_data, mapping, session_config):
-        """Process a single message with session configuration including smart AI processing."""
-        try:
-            last_id = self.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
-            if last_id and msg_data['id'] <= last_id:
-                return
-            
-            # Handle media download if enabled
-            media_path = None
-            if session_config['include_media'] and msg_data.get('has_media'):
-                media_path = await self.telegram_client.download_media(
-                    msg_data['id'], mapping.source_channel_id, msg_data.get('media_file_id')
-                )
-            
-            # Determine if AI processing should be applied
-            text_length = len(msg_data['text']) if msg_data['text'] else 0
-            should_use_ai = False
-            
-            if session_config.get('apply_ai_to_all', False):
-                # Apply AI to all messages if user requested
-                should_use_ai = True
-            elif msg_data.get('has_media', False):
-                # Always process captions (messages with media)
-                should_use_ai = True
-            
-            # Process text with AI if needed
+    def _should_use_ai(self, msg_data: Dict[str, Any]) -> bool:
+        """Decide whether a message goes through the AI under the current session config."""
+        cfg = self._session_config
+        if cfg is None:
+            return False
+        # Always process captions (messages with media); other messages only on request
+        return bool(msg_data.get('has_media', False) or cfg.get('apply_ai_to_all', False))
+
+    async def _ai_rewrite(self, msg_data: Dict[str, Any], mapping: ChannelMapping) -> Optional[str]:
+        """Return the text to save for a message; does no database work."""
+        # Determine if AI processing is needed
+        should_use_ai = self._should_use_ai(msg_data)
+        text_length = len(msg_data['text']) if msg_data['text'] else 0
+        custom_footer = self._custom_footer
+
+        # Process text
+        if should_use_ai:
+            logger.debug("Processing with AI (length: %d)", text_length)
+            processed_text = await self.ai_processor.process_message(
+                msg_data['text'], 
+                self._prompt_override or mapping.prompt_template,
+                custom_footer
+            )
+            if not processed_text:
+                # Fallback to original if AI fails
+                processed_text = msg_data['text']
+                if custom_footer:
+                    processed_text += custom_footer
+        else:
+            logger.debug("Using original text (length: %d)", text_length)
             processed_text = msg_data['text']
-            if should_use_ai and session_config['ai_system_prompt']:
-                prompt_to_use = session_config['ai_system_prompt']
-                processed_text = await self.ai_processor.process_message(
-                    msg_data['text'], 
-                    prompt_to_use,
-                    session_config['custom_footer']
-                ) or msg_data['text']
-            elif session_config['custom_footer']:
-                processed_text += session_config['custom_footer']
-            
-            # Create ProcessedMessage with media info
-            from database import ProcessedMessage
-            message = ProcessedMessage(
-                message_id=msg_data['id'],
-                source_channel_id=mapping.source_channel_id,
-                target_channel_id=mapping.target_channel_id,
-                mapping_id=mapping.id,
-                original_message=msg_data['text'],
-                processed_message=processed_text,
-                date=msg_data['date'],
-                has_media=msg_data.get('has_media', False),
-                media_type=msg_data.get('media_type'),
-                media_path=media_path,
-                media_file_id=msg_data.get('media_file_id')
+            if custom_footer:
+                processed_text += custom_footer
+        return processed_text
+
+    async def _bounded_ai_rewrite(self, msg_data: Dict[str, Any], mapping: ChannelMapping) -> Optional[str]:
+        """Run _ai_rewrite under the shared AI concurrency limit."""
+        async with self._ai_sem:
+            return await self._ai_rewrite(msg_data, mapping)
+
+    async def _persist_message(self, msg_data: Dict[str, Any], mapping: ChannelMapping,
+                               processed_text: Optional[str],
+                               pending: Optional[List[ProcessedMessage]] = None) -> Optional[ProcessedMessage]:
+        """Download media if enabled and save the processed message.
+        
+        Returns the saved (or queued) message, or None if nothing was stored.
+        """
+        if not processed_text:
+            return None
+        
+        # Handle media download if enabled and present
+        media_path = None
+        cfg = self._session_config
+        if cfg is not None and cfg.get('include_media') and msg_data.get('has_media'):
+            logger.debug("Downloading media for message %s", msg_data['id'])
+            media_path = await self.telegram_client.download_media(
+                msg_data['id'], 
+                mapping.source_channel_id, 
+                msg_data.get('media_file_id')
             )
-            
-            if self.db_manager.save_processed_message(message):
-                action = "AI-processed" if should_use_ai else "Original"
-                logging.info(f"{action} and saved message {msg_data['id']} for mapping {mapping.id}")
+            if media_path:
+                logger.debug("Media downloaded to: %s", media_path)
             else:
-                logging.error(f"Failed to save message {msg_data['id']} for mapping {mapping.id}")
+                logger.warning("Failed to download media for message %s", msg_data['id'])
+
+        # Save to database with media info
+        message = ProcessedMessage(
+            message_id=msg_data['id'],
+            source_channel_id=mapping.source_channel_id,
+            target_channel_id=mapping.target_channel_id,
+            mapping_id=mapping.id,
+            original_message=msg_data['text'],
+            processed_message=processed_text,
+            date=msg_data['date'],
+            has_media=msg_data.get('has_media', False),
+            media_type=msg_data.get('media_type'),
+            media_path=media_path,
+            media_file_id=msg_data.get('media_file_id')
+        )
         
-        except Exception as e:
-            logging.error(f"Error processing message {msg_data['id']} for mapping {mapping.id}: {e}")
-    
+        if pending is not None:
+            pending.append(message)
+            return message
+        if await self._db(self.db_manager.save_processed_message, message):
+            action = "AI-processed" if self._should_use_ai(msg_data) else "Original"
+            logger.info("%s and saved message %s for mapping %s", action, msg_data['id'], mapping.id)
+            return message
+        logger.error("Failed to save message %s for mapping %s", msg_data['id'], mapping.id)
+        return None
+
     async def start_monitoring(self) -> None:
         """Start monitoring all active channel mappings."""
         self.is_running = True
-        logging.info("Starting multi-channel monitoring...")
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        logger.info("Starting multi-channel monitoring...")
         
-        while self.is_running:
-            try:
-                active_mappings = self.config_manager.get_active_mappings()
-                
-                for mapping in active_mappings:
-                    # Only use the immediate processing method
-                    await self._process_and_post_immediately(mapping)
-                
-                # Wait before next check
-                await asyncio.sleep(5)  # Check every minute
-                
-            except Exception as e:
-                logging.error(f"Error in monitoring loop: {e}")
-                await asyncio.sleep(5)
-    
+        # New messages arrive through a Telethon event handler, which also fetches any
+        # gap behind a pushed message; the periodic sweep below establishes baselines
+        # and picks up messages newer than anything stored
+        handler = None
+        handler_sources = None
+        try:
+            while self.is_running:
+                try:
+                    view = self.config_manager.get_active_mappings_view()
+                    
+                    by_source = self._mappings_by_source = view.by_source
+                    if set(view.source_ids) != handler_sources:
+                        if handler is not None:
+                            self.telegram_client.remove_new_message_handler(handler)
+                            handler = None
+                        if by_source:  # An empty chats filter would match every chat
+                            handler = self.telegram_client.add_new_message_handler(by_source, self._on_new_message)
+                        handler_sources = set(by_source)
+
+                    # Mappings are independent, so their network round-trips overlap;
+                    # one failing mapping is logged without aborting the others
+                    results = await asyncio.gather(
+                        *(self._process_mapping_locked(mapping) for mapping in view.mappings),
+                        return_exceptions=True
+                    )
+                    for mapping_id, result in zip(view.ids, results):
+                        if isinstance(result, BaseException):
+                            logger.error("Error monitoring mapping %s: %s", mapping_id, result)
+
+                    # Wait before next sweep, waking early if monitoring is stopped
+                    try:
+                        await asyncio.wait_for(self._stop_event.wait(), SWEEP_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    
+                except Exception as e:
+                    logger.error("Error in monitoring loop: %s", e)
+                    await asyncio.sleep(5)
+        finally:
+            if handler is not None:
+                self.telegram_client.remove_new_message_handler(handler)
+
+    async def _process_mapping_locked(self, mapping: ChannelMapping) -> None:
+        """Run immediate processing for a mapping, one pass per mapping at a time."""
+        lock = self._mapping_locks.setdefault(mapping.id, asyncio.Lock())
+        async with lock:
+            await self._process_and_post_immediately(mapping)
+
     async def _process_mapping(self, mapping: ChannelMapping) -> None:
         """Process new messages for a specific mapping."""
         try:
-            last_id = self.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
+            last_id = await self._db(self.db_manager.get_last_message_id, mapping.source_channel_id, mapping.id)
             new_messages = await self.telegram_client.get_channel_messages(
                 mapping.source_channel_id, last_message_id=last_id
             )
@@ -283,44 +371,58 @@ class MultiChannelProcessor:
                     await self._process_single_message(msg_data, mapping)
                     
         except Exception as e:
-            logging.error(f"Error processing mapping {mapping.id}: {e}")
+            logger.error("Error processing mapping %s: %s", mapping.id, e)
     
     async def _post_scheduled_message(self, mapping: ChannelMapping) -> None:
         """Post a scheduled message for a specific mapping."""
         try:
-            messages = self.db_manager.get_unposted_messages(mapping.id, 1)
+            messages = await self._db(self.db_manager.get_unposted_messages, mapping.id, 1)
             
             if messages:
                 message = messages[0]
                 
+                # Checking the interval and recording the post is one atomic step, so two
+                # processes sharing the database can't both take the same slot
+                if not await self._db(self.db_manager.try_claim_post_slot, mapping.id):
+                    logger.debug("Posting interval for mapping %s has not elapsed", mapping.id)
+                    return
+                
                 if await self.telegram_client.send_message(mapping.target_channel_id, message.processed_message):
-                    self.db_manager.mark_as_posted(message.message_id, mapping.id)
-                    self.db_manager.update_post_schedule(mapping.id)
-                    logging.info(f"Posted message {message.message_id} for mapping {mapping.id}")
+                    await self._db(self.db_manager.mark_as_posted, message.message_id, mapping.id)
+                    logger.info("Posted message %s for mapping %s", message.message_id, mapping.id)
                 else:
-                    logging.error(f"Failed to post message {message.message_id} for mapping {mapping.id}")
+                    # Nothing was posted, so the slot claimed above is given back
+                    await self._db(self.db_manager.release_post_slot, mapping.id)
+                    logger.error("Failed to post message %s for mapping %s", message.message_id, mapping.id)
             else:
-                logging.info(f"No messages to post for mapping {mapping.id}")
+                logger.info("No messages to post for mapping %s", mapping.id)
                 
         except Exception as e:
-            logging.error(f"Error posting scheduled message for mapping {mapping.id}: {e}")
+            logger.error("Error posting scheduled message for mapping %s: %s", mapping.id, e)
     
     def stop_monitoring(self) -> None:
-        """Stop the monitoring process."""
+        """Stop the monitoring process; safe to call from any thread."""
         self.is_running = False
-        logging.info("Monitoring stopped")
+        loop = self._loop
+        if self._stop_event is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._stop_event.set)
+        logger.info("Monitoring stopped")
     
     async def disconnect(self) -> None:
-        """Disconnect from Telegram."""
+        """Disconnect from Telegram and release the AI HTTP pool and DB workers."""
         await self.telegram_client.disconnect()
+        await self.ai_processor.aclose()
+        # Let queued DB writes finish before the pool threads are torn down, waiting
+        # off the loop so other tasks keep running meanwhile
+        await asyncio.to_thread(self._db_executor.shutdown)
 
     async def _process_and_post_immediately(self, mapping: ChannelMapping) -> None:
         """Process new messages, save to database, then post immediately with media."""
         try:
-            print(f"\n🔍 Checking mapping: {mapping.id}")
-            print(f"   Source: {mapping.source_channel_id} -> Target: {mapping.target_channel_id}")
+            logger.debug("Checking mapping %s: %s -> %s", mapping.id,
+                         mapping.source_channel_id, mapping.target_channel_id)
             
-            last_id = self.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
+            last_id = await self._db(self.db_manager.get_last_message_id, mapping.source_channel_id, mapping.id)
             
             # If this is the first run (no last_id), get the latest message ID to start monitoring from
             if last_id is None:
@@ -330,11 +432,10 @@ class MultiChannelProcessor:
                 )
                 if recent_messages:
                     last_id = recent_messages[0]['id']
-                    print(f"   Initialized monitoring from message ID: {last_id}")
+                    logger.debug("Initialized monitoring from message ID: %s", last_id)
                     
                     # SAVE THE BASELINE TO DATABASE - This is the fix
                     # Create a dummy processed message to establish the baseline
-                    from database import ProcessedMessage
                     baseline_message = ProcessedMessage(
                         message_id=last_id,
                         source_channel_id=mapping.source_channel_id,
@@ -350,77 +451,142 @@ class MultiChannelProcessor:
                     )
                     
                     # Save and immediately mark as posted so it won't be processed
-                    if self.db_manager.save_processed_message(baseline_message):
-                        self.db_manager.mark_as_posted(last_id, mapping.id)
-                        print(f"   ✅ Baseline saved - now monitoring for new messages only")
+                    if await self._db(self.db_manager.save_processed_message, baseline_message):
+                        await self._db(self.db_manager.mark_as_posted, last_id, mapping.id)
+                        logger.info("Baseline saved for mapping %s - now monitoring for new messages only", mapping.id)
                     
                     return  # Skip processing on first run, just establish baseline
                 else:
-                    print(f"   No messages found in channel")
+                    logger.debug("No messages found in channel %s", mapping.source_channel_id)
                     return
             
-            print(f"   Last processed message ID: {last_id}")
+            logger.debug("Last processed message ID: %s", last_id)
+            
+            # Rows an earlier pass saved but did not get to post sit behind the floor,
+            # so they are retried first; a failed send leaves the rest for the next tick
+            for message in await self._db(self.db_manager.get_stranded_messages, mapping.id):
+                if not await self._post_message(message, mapping):
+                    return
             
             new_messages = await self.telegram_client.get_channel_messages(
-                mapping.source_channel_id, last_message_id=last_id, limit=20
+                mapping.source_channel_id, last_message_id=last_id
             )
             
-            print(f"   Found {len(new_messages)} new messages")
+            logger.debug("Found %d new messages", len(new_messages))
             
-            for i, msg_data in enumerate(new_messages):
-                print(f"\n📨 Message {i+1}: ID={msg_data['id']}")
-                print(f"    Text: '{msg_data['text'][:50]}...' (length: {len(msg_data['text'])})")
-                print(f"    Date: {msg_data['date']}")
-                print(f"    Has Media: {msg_data.get('has_media', False)}")
-                print(f"    Media Type: {msg_data.get('media_type', 'None')}")
-                
-                matches = self._message_matches_criteria(msg_data['text'], mapping)
-                print(f"    Matches criteria: {matches}")
+            matched: List[Dict[str, Any]] = []
+            for msg_data in new_messages:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Message %s: text=%r len=%d date=%s media=%s",
+                                 msg_data['id'], msg_data['text'][:50], len(msg_data['text']),
+                                 msg_data['date'], msg_data.get('media_type'))
                 
-                if matches:
-                    print(f"    ✅ Processing message {msg_data['id']}")
-                    
-                    # First process and save to database
-                    await self._process_single_message(msg_data, mapping)
-                    
-                    # Then get the specific message we just processed
-                    specific_message = self.db_manager.get_specific_unposted_message(mapping.id, msg_data['id'])
-                    print(f"    Looking for message ID: {msg_data['id']}")
-                    
-                    if specific_message:
-                        message = specific_message
-                        print(f"    Found specific unposted message ID: {message.message_id}")
-                        print(f"    📤 Sending to channel {mapping.target_channel_id}")
-                        print(f"    Message content: '{message.processed_message[:100]}...'")
-                        
-                        # Send with media if available
-                        if message.has_media and message.media_path:
-                            print(f"    🎬 Including media: {message.media_path}")
-                            success = await self.telegram_client.send_message(
-                                mapping.target_channel_id, 
-                                message.processed_message,
-                                message.media_path
-                            )
-                        else:
-                            success = await self.telegram_client.send_message(
-                                mapping.target_channel_id, 
-                                message.processed_message
-                            )
-                        
-                        if success:
-                            self.db_manager.mark_as_posted(message.message_id, mapping.id)
-                            print(f"    ✅ Successfully posted message {message.message_id}")
-                            if message.has_media:
-                                print(f"    ✅ Media forwarded successfully")
-                            logging.info(f"Posted message {message.message_id} immediately for mapping {mapping.id}")
-                        else:
-                            print(f"    ❌ Failed to send message {message.message_id}")
-                            logging.error(f"Failed to send message {message.message_id} for mapping {mapping.id}")
-                    else:
-                        print(f"    ❌ No unposted message found for ID: {msg_data['id']}")
+                if self._message_matches_criteria(msg_data['text'], mapping):
+                    matched.append(msg_data)
                 else:
-                    print(f"    ⭕ Skipping message (doesn't match criteria)")
+                    logger.debug("Skipping message %s (doesn't match criteria)", msg_data['id'])
+            
+            # Rewrite all matched messages concurrently, then save and post in source order
+            rewrites = await asyncio.gather(
+                *(self._bounded_ai_rewrite(msg_data, mapping) for msg_data in matched),
+                return_exceptions=True
+            )
+            
+            pending: List[ProcessedMessage] = []
+            for msg_data, processed_text in zip(matched, rewrites):
+                logger.debug("Processing message %s", msg_data['id'])
+                if isinstance(processed_text, BaseException):
+                    logger.error("Error processing message %s for mapping %s: %s", msg_data['id'], mapping.id, processed_text)
+                    continue
+                
+                try:
+                    await self._persist_message(msg_data, mapping, processed_text, pending)
+                except Exception as e:
+                    logger.error("Error processing message %s for mapping %s: %s", msg_data['id'], mapping.id, e)
+            
+            # The tick's rows are saved in one transaction; rows that were already stored
+            # (e.g. handled by the push handler) are not posted again. Posting oldest
+            # first and stopping at a failed send keeps unsent rows above the last
+            # posted one, where the next tick retries them.
+            if not pending:
+                return
+            pending.sort(key=lambda message: message.message_id)
+            for message in await self._db(self.db_manager.save_new_messages, pending):
+                if not await self._post_message(message, mapping):
+                    break
                     
         except Exception as e:
-            print(f"❌ Error in immediate processing for mapping {mapping.id}: {e}")
-            logging.error(f"Error in immediate processing for mapping {mapping.id}: {e}")
\ No newline at end of file
+            logger.error("Error in immediate processing for mapping %s: %s", mapping.id, e)
+
+    async def _post_message(self, message: ProcessedMessage, mapping: ChannelMapping) -> bool:
+        """Send a saved message to the mapping's target channel and mark it posted."""
+        logger.debug("Sending message %s to channel %s", message.message_id, mapping.target_channel_id)
+        
+        # Send with media if available
+        if message.has_media and message.media_path:
+            logger.debug("Including media: %s", message.media_path)
+            success = await self.telegram_client.send_message(
+                mapping.target_channel_id, 
+                message.processed_message,
+                message.media_path
+            )
+        else:
+            success = await self.telegram_client.send_message(
+                mapping.target_channel_id, 
+                message.processed_message
+            )
+        
+        if success:
+            await self._db(self.db_manager.mark_as_posted, message.message_id, mapping.id)
+            logger.info("Posted message %s immediately for mapping %s", message.message_id, mapping.id)
+        else:
+            logger.error("Failed to send message %s for mapping %s", message.message_id, mapping.id)
+        return success
+
+    async def _on_new_message(self, channel_id: int, msg_data: Dict[str, Any]) -> None:
+        """Handle a pushed message for every active mapping reading from `channel_id`."""
+        mappings = self._mappings_by_source.get(channel_id, ())
+        results = await asyncio.gather(
+            *(self._process_event(msg_data, mapping) for mapping in mappings),
+            return_exceptions=True
+        )
+        for mapping, result in zip(mappings, results):
+            if isinstance(result, BaseException):
+                logger.error("Error processing message %s for mapping %s: %s", msg_data['id'], mapping.id, result)
+
+    async def _process_event(self, msg_data: Dict[str, Any], mapping: ChannelMapping) -> None:
+        """Match, rewrite, save and post one pushed message for a mapping.
+        
+        Messages between the stored floor and the pushed one (e.g. updates dropped
+        while reconnecting) are fetched and handled first, since once the pushed
+        message is stored the sweep only looks past it.
+        """
+        async with self._mapping_locks.setdefault(mapping.id, asyncio.Lock()):
+            # The sweep may already have handled it; before the first sweep there is
+            # no baseline, and the sweep will establish one
+            last_id = await self._db(self.db_manager.get_last_message_id, mapping.source_channel_id, mapping.id)
+            if last_id is None or msg_data['id'] <= last_id:
+                return
+            # Non-matching messages are never stored, so remember how far we looked
+            floor = max(last_id, self._examined.get(mapping.id, 0))
+            
+            batch = [msg_data]
+            if msg_data['id'] > floor + 1:
+                missed = await self.telegram_client.get_channel_messages(
+                    mapping.source_channel_id, last_message_id=floor
+                )
+                missed = sorted((m for m in missed if floor < m['id'] < msg_data['id']), key=lambda m: m['id'])
+                if missed:
+                    logger.info("Catching up %d missed messages for mapping %s", len(missed), mapping.id)
+                batch = missed + batch
+            
+            # The high-water mark stops at the first item that was not saved and posted
+            handled = True
+            for item in batch:
+                if self._message_matches_criteria(item['text'], mapping):
+                    processed_text = await self._bounded_ai_rewrite(item, mapping)
+                    message = await self._persist_message(item, mapping, processed_text)
+                    if not message or not await self._post_message(message, mapping):
+                        handled = False
+                if handled:
+                    self._examined[mapping.id] = item['id']
@@ -1,10 +1,9 @@
-import asyncio
 from typing import Optional
-from config import ConfigManager, ChannelMapping, TelegramConfig, AIConfig
+from config import ConfigManager, ChannelMapping, TelegramConfig, AIConfig, parse_keywords
 from main_processor import MultiChannelProcessor
-from database import DatabaseManager
+from database import DatabaseManager, ProcessedMessage
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from datetime import datetime
 from config import SavedFooter  # Add this import
@@ -110,7 +109,7 @@ class MenuSystem:
         if phone:
             current.phone_number = phone
         
-        if self.config_manager.save_config():
+        if await self.config_manager.save_config_async():
             print("Telegram configuration saved successfully!")
         else:
             print("Error saving configuration!")
@@ -184,7 +183,7 @@ class MenuSystem:
                     current.base_url = base_url
         
         # Save and test
-        if self.config_manager.save_config():
+        if await self.config_manager.save_config_async():
             print("Configuration saved! Testing connection...")
             await self._test_ai_connection()
         else:
@@ -323,9 +322,11 @@ class MenuSystem:
                 from ai_processor import UniversalMessageProcessor
                 ai_config = self.config_manager.ai_config
                 test_processor = UniversalMessageProcessor(
-                    ai_config.api_key, ai_config.model, ai_config.provider, ai_config.base_url
+                    ai_config.api_key, ai_config.model, ai_config.provider, ai_config.base_url,
+                    min_length=0  # The test message is short but must still reach the API
                 )
                 test_result = await test_processor.process_message("تست", None)
+                await test_processor.aclose()
                 if not test_result:
                     print("Error: Cannot connect to AI API!")
                     return
@@ -398,10 +399,11 @@ class MenuSystem:
             try:
                 if processing_choice in ['1', '3']:  # Historical processing
                     print(f"\nProcessing historical messages (Mode {current_mode})...")
+                    # One window for the whole sweep, so every mapping sees the same floor
+                    since_date = datetime.now(timezone.utc) - timedelta(days=7)
                     for mapping in active_mappings:
                         print(f"Processing {mapping.id}...")
                         
-                        since_date = datetime.now() - timedelta(days=7)
                         messages = await self.processor.telegram_client.get_channel_messages(
                             mapping.source_channel_id, since_date=since_date
                         )
@@ -413,7 +415,7 @@ class MenuSystem:
                         
                         print(f"  Found {len(messages)} total messages, {matching_count} matching criteria")
                         
-                        await self._process_mapping_with_config(mapping, session_config, historical=True)
+                        await self._process_mapping_with_config(mapping, session_config, since_date=since_date)
                     
                     print("Historical processing completed!")
                 
@@ -468,28 +470,9 @@ class MenuSystem:
         input_thread_obj = threading.Thread(target=input_thread, daemon=True)
         input_thread_obj.start()
         
-        # Start monitoring
-        self.processor.is_running = True
-        logging.info("Starting multi-channel monitoring...")
-        
+        # Start monitoring; the input thread ends it through stop_monitoring()
         try:
-            while self.processor.is_running and monitoring_active:
-                try:
-                    active_mappings = self.config_manager.get_active_mappings()
-                    
-                    for mapping in active_mappings:
-                        if not monitoring_active:
-                            break
-                        # Only use the immediate processing method
-                        await self.processor._process_and_post_immediately(mapping)
-                    
-                    # Wait before next check
-                    await asyncio.sleep(5)  # Check every 5 seconds
-                    
-                except Exception as e:
-                    logging.error(f"Error in monitoring loop: {e}")
-                    await asyncio.sleep(5)
-                    
+            await self.processor.start_monitoring()
         except KeyboardInterrupt:
             print("\n⏹️  Monitoring stopped by user.")
         finally:
@@ -498,16 +481,15 @@ class MenuSystem:
                 self.processor.stop_monitoring()
             print("✅ Returned to main menu.")
 
-    async def _process_mapping_with_config(self, mapping, session_config, historical=False):
-        """Process mapping with session configuration."""
+    async def _process_mapping_with_config(self, mapping, session_config, since_date=None):
+        """Process mapping with session configuration; since_date limits a historical pass."""
         try:
-            if historical:
-                since_date = datetime.now() - timedelta(days=7)
+            last_id = self.processor.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
+            if since_date:
                 messages = await self.processor.telegram_client.get_channel_messages(
-                    mapping.source_channel_id, since_date=since_date
+                    mapping.source_channel_id, since_date=since_date, last_message_id=last_id
                 )
             else:
-                last_id = self.processor.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
                 messages = await self.processor.telegram_client.get_channel_messages(
                     mapping.source_channel_id, last_message_id=last_id
                 )
@@ -522,10 +504,6 @@ class MenuSystem:
     async def _process_single_message_with_config(self, msg_data, mapping, session_config):
         """Process a single message with session configuration including media."""
         try:
-            last_id = self.processor.db_manager.get_last_message_id(mapping.source_channel_id, mapping.id)
-            if last_id and msg_data['id'] <= last_id:
-                return
-            
             # Handle media download if enabled
             media_path = None
             if session_config['include_media'] and msg_data.get('has_media'):
@@ -536,7 +514,7 @@ class MenuSystem:
             # Process text with AI if enabled
             processed_text = msg_data['text']
             if session_config['use_ai_agent'] and session_config['ai_system_prompt']:
-                prompt_to_use = f"{session_config['ai_system_prompt']}\n\nOriginal text: {{original_text}}\n\nPlease provide only the rewritten text."
+                prompt_to_use = f"{session_config['ai_system_prompt']}\n\nPlease provide only the rewritten text.\n\nOriginal text: {{original_text}}"
                 processed_text = await self.processor.ai_processor.process_message(
                     msg_data['text'], 
                     prompt_to_use,
@@ -546,7 +524,6 @@ class MenuSystem:
                 processed_text += session_config['custom_footer']
             
             # Create ProcessedMessage with media info
-            from database import ProcessedMessage
             message = ProcessedMessage(
                 message_id=msg_data['id'],
                 source_channel_id=mapping.source_channel_id,
@@ -618,11 +595,13 @@ class MenuSystem:
                 ai_config.api_key, 
                 ai_config.model, 
                 ai_config.provider, 
-                ai_config.base_url
+                ai_config.base_url,
+                min_length=0  # The test message is short but must still reach the API
             )
             
             # Test with simple message
             test_result = await processor.process_message("تست اتصال", None)
+            await processor.aclose()
             
             if test_result:
                 print("✓ AI connection successful!")
@@ -694,7 +673,7 @@ class MenuSystem:
         
         # Get other details
         keywords_input = input("Enter keywords (comma-separated, or press Enter for none): ").strip()
-        keywords = [k.strip() for k in keywords_input.split(",")] if keywords_input else []
+        keywords = parse_keywords(keywords_input)
         
         signature = input("Enter required signature (e.g., @Fundamental_View): ").strip()
         
@@ -740,7 +719,7 @@ class MenuSystem:
         current_keywords = ', '.join(mapping.keywords) if mapping.keywords else ''
         keywords_input = input(f"Keywords (current: {current_keywords}): ").strip()
         if keywords_input:
-            mapping.keywords = [k.strip() for k in keywords_input.split(",")]
+            mapping.keywords = parse_keywords(keywords_input)
         
         # Edit signature
         signature = input(f"Signature (current: {mapping.signature}): ").strip()
@@ -757,7 +736,7 @@ class MenuSystem:
             if custom_prompt:
                 mapping.prompt_template = custom_prompt
         
-        if self.config_manager.save_config():
+        if await self.config_manager.save_config_async():
             print("Mapping updated successfully!")
         else:
             print("Error updating mapping!")
@@ -979,8 +958,7 @@ class MenuSystem:
             channels = self.db_manager.get_all_channels()
             print(f"Stored Channels: {len(channels)}")
             
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("SELECT COUNT(*) FROM processed_messages")
@@ -1018,8 +996,7 @@ class MenuSystem:
         print("\n--- Unposted Messages Management ---")
         
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -1090,8 +1067,7 @@ class MenuSystem:
         print("\n--- Recent Activity ---")
         
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -1134,8 +1110,7 @@ class MenuSystem:
         print("\n--- Processed Messages Management ---")
         
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 print("Search options:")
@@ -1226,8 +1201,7 @@ class MenuSystem:
         print("\n--- Database Cleanup ---")
         
         try:
-            import sqlite3
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 print("Cleanup options:")
@@ -1263,9 +1237,10 @@ class MenuSystem:
                 elif cleanup_choice == "3":
                     confirm = input("Clear all posting schedules? (y/n): ").strip().lower()
                     if confirm == 'y':
-                        cursor.execute("DELETE FROM posting_schedule")
-                        conn.commit()
-                        print("Posting schedules cleared.")
+                        if self.db_manager.clear_post_schedules():
+                            print("Posting schedules cleared.")
+                        else:
+                            print("Error clearing posting schedules.")
                 
                 elif cleanup_choice == "4":
                     print("Optimizing database...")
@@ -1290,12 +1265,11 @@ class MenuSystem:
         print("\n--- Messages with Media ---")
         
         try:
-            import sqlite3
             import subprocess
             import platform
             from pathlib import Path  # Add this import
             
-            with sqlite3.connect(self.db_manager.db_path) as conn:
+            with self.db_manager.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Get messages with media
@@ -2,13 +2,50 @@ import asyncio
 import logging
 import os
 import time
-from typing import List, Dict, Any, Optional
-from telethon import TelegramClient
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Iterable
+from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError, ChannelPrivateError
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+# Sends allowed per minute and in flight at once, shared by every mapping on a client
+SEND_RATE_PER_MINUTE = 20
+SEND_CONCURRENCY = 4
+
+
+class _SendThrottle:
+    """Token bucket for outgoing messages; a flood wait freezes it for every caller."""
+    
+    def __init__(self, rate_per_minute: int):
+        self.interval = 60.0 / rate_per_minute
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.frozen_until = 0.0
+        self._lock = asyncio.Lock()  # Waiters are served in arrival order
+    
+    async def acquire(self) -> None:
+        """Wait until a send is allowed, then take one token."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.frozen_until:
+                    await asyncio.sleep(self.frozen_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.interval)
+    
+    def freeze(self, seconds: float) -> None:
+        """Block all sends for `seconds`, then resume with an empty bucket."""
+        self.frozen_until = max(self.frozen_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.frozen_until
+
 
 class TelegramChannelClient:
     """Enhanced Telegram client with media support and database lock prevention."""
@@ -21,6 +58,8 @@ class TelegramChannelClient:
         self.session_name = session_name
         self.media_dir = Path("media")
         self.media_dir.mkdir(exist_ok=True)
+        self._send_sem = asyncio.Semaphore(SEND_CONCURRENCY)
+        self._send_throttle = _SendThrottle(SEND_RATE_PER_MINUTE)
     
     async def initialize(self) -> bool:
         """Initialize and authenticate the client with session reuse."""
@@ -81,13 +120,16 @@ class TelegramChannelClient:
             messages = []
             kwargs = {}
             
-            if since_date:
-                kwargs['offset_date'] = since_date
-            elif last_message_id:
+            # offset_date would return messages *older* than since_date, so the date floor
+            # is applied while iterating newest-first instead
+            if since_date and since_date.tzinfo is None:
+                since_date = since_date.astimezone(timezone.utc)
+            
+            if last_message_id:
                 kwargs['min_id'] = last_message_id
             elif limit:
                 kwargs['limit'] = limit
-            else:
+            elif not since_date:
                 kwargs['limit'] = 10
             
             # Only set limit if specified
@@ -96,18 +138,11 @@ class TelegramChannelClient:
             
             # Add timeout to prevent hanging
             async for message in self.client.iter_messages(channel_id, **kwargs):
-                if message:
-                    # Extract media information
-                    media_info = await self._extract_media_info(message)
-                    
-                    messages.append({
-                        'id': message.id,
-                        'text': message.text or '',
-                        'date': message.date,
-                        'has_media': media_info['has_media'],
-                        'media_type': media_info['media_type'],
-                        'media_file_id': media_info['media_file_id']
-                    })
+                if not message:
+                    continue
+                if since_date and message.date < since_date:
+                    break
+                messages.append(await self._message_to_dict(message))
             
             # Sort by message ID descending (newest first) when using min_id
             if last_message_id:
@@ -122,6 +157,38 @@ class TelegramChannelClient:
             logging.error(f"Error getting messages from channel {channel_id}: {e}")
             return []
     
+    async def _message_to_dict(self, message) -> Dict[str, Any]:
+        """Convert a Telethon message into the dict shape used by the processor."""
+        # Extract media information
+        media_info = await self._extract_media_info(message)
+        return {
+            'id': message.id,
+            'text': message.text or '',
+            'date': message.date,
+            'has_media': media_info['has_media'],
+            'media_type': media_info['media_type'],
+            'media_file_id': media_info['media_file_id']
+        }
+    
+    def add_new_message_handler(self, channel_ids: Iterable[int],
+                                callback: Callable[[int, Dict[str, Any]], Awaitable[None]]):
+        """Call `callback(channel_id, msg_data)` for each new message in the given channels.
+        
+        Returns a handle for remove_new_message_handler.
+        """
+        async def handler(event):
+            try:
+                await callback(event.chat_id, await self._message_to_dict(event.message))
+            except Exception as e:
+                logging.error(f"Error handling new message in channel {event.chat_id}: {e}")
+        
+        self.client.add_event_handler(handler, events.NewMessage(chats=list(channel_ids)))
+        return handler
+    
+    def remove_new_message_handler(self, handler) -> None:
+        """Unregister a handler returned by add_new_message_handler."""
+        self.client.remove_event_handler(handler)
+    
     async def _extract_media_info(self, message) -> Dict[str, Any]:
         """Extract media information from a message."""
         media_info = {
@@ -208,38 +275,42 @@ class TelegramChannelClient:
         return '.bin'
     
     async def send_message(self, channel_id: int, message_text: str, media_path: Optional[str] = None) -> bool:
-        """Send a message to a channel with optional media as single post."""
+        """Send a message to a channel with optional media as single post.
+        
+        Sends from all mappings share one rate limit; a flood wait pauses all of them.
+        """
         max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if media_path and Path(media_path).exists():
-                    # For media posts, use caption (max 1024 chars)
-                    if len(message_text) > 1024:
-                        # Truncate to fit in single caption
-                        caption = message_text[:1020] + "..."
-                        await self.client.send_file(channel_id, media_path, caption=caption)
+        async with self._send_sem:
+            for attempt in range(max_retries):
+                await self._send_throttle.acquire()
+                try:
+                    if media_path and Path(media_path).exists():
+                        # For media posts, use caption (max 1024 chars)
+                        if len(message_text) > 1024:
+                            # Truncate to fit in single caption
+                            caption = message_text[:1020] + "..."
+                            await self.client.send_file(channel_id, media_path, caption=caption)
+                        else:
+                            await self.client.send_file(channel_id, media_path, caption=message_text)
                     else:
-                        await self.client.send_file(channel_id, media_path, caption=message_text)
-                else:
-                    # For text-only posts, Telegram allows up to 4096 characters
-                    if len(message_text) > 4096:
-                        # Truncate to fit in single message
-                        message_text = message_text[:4090] + "..."
+                        # For text-only posts, Telegram allows up to 4096 characters
+                        if len(message_text) > 4096:
+                            # Truncate to fit in single message
+                            message_text = message_text[:4090] + "..."
+                        
+                        await self.client.send_message(channel_id, message_text)
+                    return True
                     
-                    await self.client.send_message(channel_id, message_text)
-                return True
-                
-            except FloodWaitError as e:
-                logging.warning(f"Flood wait error: {e.seconds} seconds")
-                await asyncio.sleep(e.seconds)
-                return False
-                
-            except Exception as e:
-                logging.error(f"Error sending message to channel {channel_id} (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)
-                else:
-                    return False
+                except FloodWaitError as e:
+                    # The next acquire() parks this and every other sender until the wait is over
+                    logging.warning(f"Flood wait error: {e.seconds} seconds")
+                    self._send_throttle.freeze(e.seconds)
+                    
+                except Exception as e:
+                    logging.error(f"Error sending message to channel {channel_id} (attempt {attempt + 1}): {e}")
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(2)
+        return False
     
     async def disconnect(self) -> None:
         """Disconnect from Telegram with proper cleanup."""